@@ -3,85 +3,647 @@ CryptoBuddy Pro - API Utilities
 Handles CoinGecko API integration for real-time cryptocurrency data
 """
 
+import asyncio
+import contextvars
+import functools
+import os
+import random
+import threading
 import requests
 import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
 from colorama import Fore, Style
+from cache_utils import TTLCache, SQLiteCacheStore
+from metrics_utils import Metrics
+
+# Set while rendering from data that has already been prefetched
+_CACHE_ONLY = contextvars.ContextVar("cryptobuddy_cache_only", default=False)
+
+class _PoolTrackingAdapter(HTTPAdapter):
+    """HTTPAdapter that notes whether the current thread's request opened a new connection
+    
+    urllib3 opens a connection on the thread that needs it, so wrapping
+    each pool's _new_conn and flagging the calling thread attributes every
+    handshake to the request that paid for it, even while other threads
+    open connections in the same pool.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        self._local = threading.local()
+        super().__init__(*args, **kwargs)
+    
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        return self._track(super().get_connection_with_tls_context(*args, **kwargs))
+    
+    def get_connection(self, *args, **kwargs):
+        # Older requests releases call this instead of get_connection_with_tls_context
+        return self._track(super().get_connection(*args, **kwargs))
+    
+    def _track(self, pool):
+        """Hook a pool's connection factory on first use and reset this thread's flag"""
+        if not getattr(pool, "_tracks_handshakes", False):
+            new_conn = pool._new_conn
+            local = self._local
+            
+            def tracked_new_conn():
+                local.opened = True
+                return new_conn()
+            
+            pool._new_conn = tracked_new_conn
+            pool._tracks_handshakes = True
+        self._local.opened = False
+        return pool
+    
+    def opened_connection(self):
+        """Whether the last request on this thread had to open a new connection"""
+        return getattr(self._local, "opened", False)
+
+class HTTPTransport:
+    """Pooled, retrying HTTP session used for all CoinGecko requests"""
+    
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+    
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        """Create a keep-alive session with a bounded connection pool"""
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        
+        # Retries are handled here so they can be counted and jittered
+        self.adapter = _PoolTrackingAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive"
+        })
+        
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+    
+    def get(self, url, endpoint, params=None, before_attempt=None):
+        """GET a URL, retrying 5xx responses and timeouts with jittered backoff
+        
+        before_attempt, if given, is called before every attempt, retries
+        included, so each request on the wire can be rate limited.
+        """
+        attempt = 0
+        while True:
+            if before_attempt is not None:
+                before_attempt()
+            if attempt:
+                self._record(endpoint, "retries")
+            try:
+                response = self._send(url, endpoint, params)
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    if not response.ok:
+                        self._record(endpoint, "errors")
+                    response.raise_for_status()
+                    return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    self._record(endpoint, "errors")
+                    raise
+            
+            attempt += 1
+            time.sleep(self._backoff_delay(attempt))
+    
+    def _send(self, url, endpoint, params):
+        """Send a single request and record whether it needed a new connection"""
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        
+        # A new pooled connection means we paid for a TCP (and TLS) handshake
+        if self.adapter.opened_connection():
+            self._record(endpoint, "handshakes")
+        else:
+            self._record(endpoint, "reused")
+        self._record(endpoint, "requests")
+        return response
+    
+    def _backoff_delay(self, attempt):
+        """Exponential backoff with full jitter"""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+    
+    def _record(self, endpoint, counter):
+        """Increment a per-endpoint counter"""
+        with self._stats_lock:
+            endpoint_stats = self.stats.setdefault(endpoint, {
+                "requests": 0, "handshakes": 0, "reused": 0, "retries": 0, "errors": 0
+            })
+            endpoint_stats[counter] += 1
+    
+    def get_stats(self):
+        """Get a snapshot of the per-endpoint connection counters"""
+        with self._stats_lock:
+            return {endpoint: dict(counters) for endpoint, counters in self.stats.items()}
+    
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+class RateLimited(Exception):
+    """Raised when a request cannot be sent within the client-side rate budget"""
+
+class RateLimiter:
+    """Token bucket that keeps a reserve for interactive requests
+    
+    Background work (refresh, prefetch) may only spend tokens above the
+    reserve and never waits; interactive requests may wait up to max_wait.
+    A 429 from the server blocks every request until Retry-After passes.
+    """
+    
+    INTERACTIVE = "interactive"
+    BACKGROUND = "background"
+    
+    def __init__(self, calls_per_minute=30, burst=10, background_reserve=3, max_wait=2.0):
+        self.rate = calls_per_minute / 60.0
+        self.capacity = burst
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+        self.rejected = 0
+        self.throttled = 0
+        self._waiting_interactive = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, priority=INTERACTIVE):
+        """Take a token, waiting if allowed, or raise RateLimited"""
+        interactive = priority == self.INTERACTIVE
+        deadline = time.monotonic() + (self.max_wait if interactive else 0)
+        
+        with self._lock:
+            if interactive:
+                self._waiting_interactive += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+                    
+                    if now < self.blocked_until:
+                        wait = self.blocked_until - now
+                    elif not interactive and self._waiting_interactive:
+                        wait = None
+                    else:
+                        floor = 0 if interactive else self.background_reserve
+                        if self.tokens - 1 >= floor:
+                            self.tokens -= 1
+                            return
+                        wait = (floor + 1 - self.tokens) / self.rate
+                    
+                    if wait is None or now + wait > deadline:
+                        self.rejected += 1
+                        raise RateLimited("client-side request budget exhausted")
+                time.sleep(wait)
+        finally:
+            if interactive:
+                with self._lock:
+                    self._waiting_interactive -= 1
+    
+    def _refill(self, now):
+        """Add tokens for the time elapsed since the last update"""
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def block_for(self, seconds):
+        """Stop issuing requests after the server answered 429"""
+        with self._lock:
+            self.throttled += 1
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+    
+    def stats(self):
+        """Get the current budget and how often requests were held back"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "tokens": round(self.tokens, 2),
+                "capacity": self.capacity,
+                "rejected": self.rejected,
+                "throttled": self.throttled,
+                "blocked_for": max(0.0, round(self.blocked_until - time.monotonic(), 1))
+            }
+
+def parse_retry_after(value, default=60.0):
+    """Convert a Retry-After header (seconds or HTTP date) into seconds"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one shared execution
+    
+    The first caller for a key runs the function; everyone arriving while
+    it is in flight waits on the same future and gets its result or error.
+    Threaded callers use do(), asyncio callers await do_async().
+    """
+    
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+    
+    def do(self, key, fn):
+        """Run fn for key, or wait for the identical call already in flight"""
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn)
+        return future.result()
+    
+    async def do_async(self, key, fn):
+        """Like do(), but awaits without blocking the event loop
+        
+        The leader only schedules the call and then waits like everyone
+        else, so cancelling it (e.g. a timed-out request) can neither stop
+        the queued call nor leave the key in flight for later callers.
+        """
+        future, leader = self._join(key)
+        if leader:
+            job = asyncio.get_running_loop().run_in_executor(None, self._run, key, future, fn)
+            job.add_done_callback(lambda job: self._abandon(key, future) if job.cancelled() else None)
+        
+        # A cancelled waiter must not cancel the shared call
+        return await asyncio.shield(asyncio.wrap_future(future))
+    
+    def _join(self, key):
+        """Get the in-flight future for key, creating it if we are first"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            
+            future = Future()
+            self._calls[key] = future
+            return future, True
+    
+    def _run(self, key, future, fn):
+        """Execute fn and publish its outcome to every waiter"""
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+        else:
+            self._finish(key)
+            future.set_result(result)
+    
+    def _abandon(self, key, future):
+        """Release waiters of a call whose job was cancelled before it ran (e.g. executor shutdown)"""
+        self._finish(key)
+        future.cancel()
+    
+    def _finish(self, key):
+        """Let later callers start a fresh call"""
+        with self._lock:
+            self._calls.pop(key, None)
+    
+    def stats(self):
+        """Get the number of coalesced and currently in-flight calls"""
+        with self._lock:
+            return {"coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+class BackgroundRefresher:
+    """Daemon thread that refreshes hot cache entries before they expire"""
+    
+    def __init__(self, api, interval=15, lead_time=30):
+        self.api = api
+        self.interval = interval
+        self.lead_time = lead_time
+        self._requested = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Start the refresh thread"""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cryptobuddy-refresher", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=5):
+        """Stop the refresh thread and wait for it to exit"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def is_running(self):
+        """Whether the refresh thread is alive"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def request(self, cache_key):
+        """Ask for a key to be refreshed as soon as possible"""
+        with self._lock:
+            self._requested.add(cache_key)
+        self._wake.set()
+    
+    def _run(self):
+        """Refresh loop: wake every interval, or early when a stale key was served"""
+        self.api.set_request_priority(RateLimiter.BACKGROUND)
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            
+            with self._lock:
+                requested, self._requested = self._requested, set()
+            
+            try:
+                self.api.refresh_hot_keys(self.lead_time, requested)
+            except Exception as e:
+                print(f"{Fore.RED}❌ Background refresh error: {e}{Style.RESET_ALL}")
 
 class CoinGeckoAPI:
     """CoinGecko API wrapper for cryptocurrency data"""
     
-    def __init__(self):
-        self.base_url = "https://api.coingecko.com/api/v3"
+    DEFAULT_BASE_URL = "https://api.coingecko.com/api/v3"
+    
+    # Seconds each kind of response stays fresh
+    DEFAULT_CACHE_TTLS = {
+        "price": 300,
+        "top_coins": 300,
+        "trending": 600,
+        "details": 3600
+    }
+    
+    # Rate limited or upstream down, expired entries are served for at most this many TTLs past expiry
+    STALE_FALLBACK_TTLS = 3
+    
+    def __init__(self, transport=None, cache_ttls=None, max_cache_entries=2048, cache_path=None,
+                 max_staleness=120, rate_limiter=None, base_url=None, metrics=None):
+        # Point at a stand-in server (see coingecko_standin.py) to run offline
+        base_url = base_url or os.environ.get("CRYPTOBUDDY_API_URL") or self.DEFAULT_BASE_URL
+        self.base_url = base_url.rstrip("/")
+        self.transport = transport or HTTPTransport()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Stage timings shared with the chatbot; disabled unless CRYPTOBUDDY_METRICS is set
+        self.metrics = metrics or Metrics()
+        self._request_context = threading.local()
         self.last_refresh = None
-        self.cache = {}
+        
+        # Failed requests so far, so callers can tell whether an answer was built after an error
+        self.request_errors = 0
+        self._errors_lock = threading.Lock()
         self.cache_duration = 300  # 5 minutes cache
         
-    def _make_request(self, endpoint, params=None):
+        # Stale-while-revalidate: how long past expiry an entry may still be served
+        self.max_staleness = max_staleness
+        self.refresher = None
+        self.hot_coin_ids = []
+        self._top_coins_keys = set()
+        
+        # Identical requests issued concurrently share a single fetch
+        self.inflight = SingleFlight()
+        
+        # Optional on-disk cache shared across restarts and worker processes
+        cache_path = cache_path or os.environ.get("CRYPTOBUDDY_CACHE_PATH")
+        self.cache = TTLCache(
+            default_ttl=self.cache_duration,
+            ttls={**self.DEFAULT_CACHE_TTLS, **(cache_ttls or {})},
+            max_entries=max_cache_entries,
+            store=SQLiteCacheStore(cache_path) if cache_path else None
+        )
+    
+    def _make_request(self, endpoint, params=None, label=None):
         """Make a request to the CoinGecko API with error handling"""
-        try:
-            url = f"{self.base_url}/{endpoint}"
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"{Fore.RED}❌ API Error: {e}{Style.RESET_ALL}")
+        if _CACHE_ONLY.get():
             return None
+        try:
+            request_key = self._request_key(endpoint, params)
+            with self.metrics.span(f"api.{label or endpoint}"):
+                return self.inflight.do(request_key, lambda: self._request_json(endpoint, params, label))
         except Exception as e:
-            print(f"{Fore.RED}❌ Unexpected error: {e}{Style.RESET_ALL}")
+            self._report_request_error(e)
+            return None
+    
+    def _request_key(self, endpoint, params):
+        """Identity of a request, used to coalesce identical in-flight calls"""
+        return (endpoint, tuple(sorted((params or {}).items())))
+    
+    def _report_request_error(self, error):
+        """Count a failed request and tell the user why it produced no data"""
+        with self._errors_lock:
+            self.request_errors += 1
+        if isinstance(error, RateLimited):
+            print(f"{Fore.YELLOW}⏳ Rate limited: {error}{Style.RESET_ALL}")
+        elif isinstance(error, requests.exceptions.RequestException):
+            print(f"{Fore.RED}❌ API Error: {error}{Style.RESET_ALL}")
+        else:
+            print(f"{Fore.RED}❌ Unexpected error: {error}{Style.RESET_ALL}")
+    
+    def _request_json(self, endpoint, params=None, label=None):
+        """Send one request through the transport and decode the JSON body"""
+        priority = self.get_request_priority()
+        
+        url = f"{self.base_url}/{endpoint}"
+        try:
+            # Every attempt, retries included, spends a rate-limit token
+            response = self.transport.get(url, label or endpoint, params=params,
+                                          before_attempt=lambda: self.rate_limiter.acquire(priority))
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 429:
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                self.rate_limiter.block_for(retry_after)
+                raise RateLimited(f"CoinGecko asked us to retry after {retry_after:.0f}s") from e
+            raise
+        return response.json()
+    
+    def set_request_priority(self, priority):
+        """Set the rate-limit priority for requests made from this thread"""
+        self._request_context.priority = priority
+    
+    def get_request_priority(self):
+        """Get the rate-limit priority for requests made from this thread"""
+        return getattr(self._request_context, "priority", RateLimiter.INTERACTIVE)
+    
+    @contextmanager
+    def cache_only(self):
+        """Serve fresh or stale cached data only; no requests are sent inside this block"""
+        token = _CACHE_ONLY.set(True)
+        try:
+            yield
+        finally:
+            _CACHE_ONLY.reset(token)
+    
+    def _get_cached(self, cache_key):
+        """Get a cached value, serving stale data while a background refresh runs"""
+        with self.metrics.span("api.cache_lookup"):
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
+            if self.refresher and self.refresher.is_running():
+                stale = self.cache.get_stale(cache_key, self.max_staleness)
+                if stale is not None:
+                    self._note_stale(cache_key)
+                    self.refresher.request(cache_key)
+                    return stale
             return None
     
+    def _get_stale(self, cache_key):
+        """Get an expired value as a fallback, unless it expired more than STALE_FALLBACK_TTLS TTLs ago"""
+        stale = self.cache.get_stale(cache_key, self.cache.ttl_for(cache_key) * self.STALE_FALLBACK_TTLS)
+        if stale is not None:
+            self._note_stale(cache_key)
+        return stale
+    
+    @contextmanager
+    def track_stale(self):
+        """Collect the values served past their TTL on this thread inside this block
+        
+        Yields a dict filled with cache key -> when that value was fetched.
+        """
+        stale = {}
+        outer = getattr(self._request_context, "stale", None)
+        self._request_context.stale = stale
+        try:
+            yield stale
+        finally:
+            self._request_context.stale = outer
+            if outer is not None:
+                outer.update(stale)
+    
+    def _note_stale(self, cache_key):
+        """Record a value served past its TTL for the enclosing track_stale block, if any"""
+        stale = getattr(self._request_context, "stale", None)
+        fetched_at = self.cache.fetched_at(cache_key) if stale is not None else None
+        if fetched_at is not None:
+            stale[cache_key] = fetched_at
+    
     def get_coin_price(self, coin_id, vs_currency="usd"):
         """Get current price for a specific coin"""
-        cache_key = f"price_{coin_id}_{vs_currency}"
-        
-        # Check cache first
-        if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]
+        return self.get_coin_prices([coin_id], vs_currency).get(coin_id)
+    
+    def get_coin_prices(self, coin_ids, vs_currency="usd"):
+        """Get current prices for several coins with a single batched request"""
+        prices, missing = self._lookup_prices(coin_ids, vs_currency)
+        if missing:
+            prices.update(self._fetch_prices(missing, vs_currency))
+            self._fill_stale_prices(prices, missing, vs_currency)
+        return prices
+    
+    def get_cached_prices(self, coin_ids, vs_currency="usd"):
+        """Get the prices of coin_ids that can be served from cache, without any request"""
+        return self._lookup_prices(coin_ids, vs_currency)[0]
+    
+    def _lookup_prices(self, coin_ids, vs_currency):
+        """Split coin_ids into cached prices and ids that still need fetching"""
+        prices = {}
+        missing = []
         
+        # Serve what we can from the per-coin cache
+        for coin_id in dict.fromkeys(coin_ids):
+            cached = self._get_cached(("price", coin_id, vs_currency))
+            if cached is not None:
+                prices[coin_id] = cached
+            else:
+                missing.append(coin_id)
+        return prices, missing
+    
+    def _fill_stale_prices(self, prices, coin_ids, vs_currency):
+        """Rate limited or upstream down: old prices beat no prices"""
+        for coin_id in coin_ids:
+            if coin_id not in prices:
+                stale = self._get_stale(("price", coin_id, vs_currency))
+                if stale is not None:
+                    prices[coin_id] = stale
+    
+    def _fetch_prices(self, coin_ids, vs_currency):
+        """Fetch prices for coin_ids in one simple/price call and cache them"""
+        endpoint, params = self._prices_request(coin_ids, vs_currency)
+        return self._store_prices(self._make_request(endpoint, params), coin_ids, vs_currency)
+    
+    def _prices_request(self, coin_ids, vs_currency):
+        """Build the simple/price request for a batch of coins"""
         endpoint = "simple/price"
         params = {
-            "ids": coin_id,
+            "ids": ",".join(coin_ids),
             "vs_currencies": vs_currency,
             "include_24hr_change": "true",
             "include_market_cap": "true",
             "include_24hr_vol": "true"
         }
-        
-        data = self._make_request(endpoint, params)
-        if data and coin_id in data:
-            result = data[coin_id]
-            self.cache[cache_key] = result
-            self.cache[f"{cache_key}_timestamp"] = time.time()
+        return endpoint, params
+    
+    def _store_prices(self, data, coin_ids, vs_currency):
+        """Cache each coin from a simple/price response"""
+        prices = {}
+        if data:
+            timestamp = time.time()
+            for coin_id in coin_ids:
+                if coin_id in data:
+                    self.cache.set(("price", coin_id, vs_currency), data[coin_id], timestamp)
+                    prices[coin_id] = data[coin_id]
             self.last_refresh = datetime.now()
-            return result
-        return None
+        return prices
     
     def get_trending_coins(self):
         """Get trending cryptocurrencies"""
-        cache_key = "trending"
-        
-        if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]
-        
-        endpoint = "search/trending"
-        data = self._make_request(endpoint)
-        
+        cached = self._get_cached(("trending",))
+        if cached is not None:
+            return cached
+        return self._fetch_trending() or self._get_stale(("trending",))
+    
+    def _fetch_trending(self):
+        """Fetch trending coins and cache them"""
+        endpoint, params = self._trending_request()
+        return self._store_trending(self._make_request(endpoint, params))
+    
+    def _trending_request(self):
+        """Build the search/trending request"""
+        return "search/trending", None
+    
+    def _store_trending(self, data):
+        """Cache the coins from a search/trending response"""
         if data and "coins" in data:
             trending = data["coins"]
-            self.cache[cache_key] = trending
-            self.cache[f"{cache_key}_timestamp"] = time.time()
+            self.cache.set(("trending",), trending)
             self.last_refresh = datetime.now()
             return trending
         return None
     
     def get_top_coins(self, limit=10, vs_currency="usd"):
         """Get top cryptocurrencies by market cap"""
-        cache_key = f"top_coins_{limit}_{vs_currency}"
-        
-        if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]
+        cache_key = ("top_coins", limit, vs_currency)
+        self._top_coins_keys.add(cache_key)
         
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+        return self._fetch_top_coins(limit, vs_currency) or self._get_stale(cache_key)
+    
+    def _fetch_top_coins(self, limit, vs_currency):
+        """Fetch the top coins by market cap and cache them"""
+        endpoint, params = self._top_coins_request(limit, vs_currency)
+        return self._store_top_coins(self._make_request(endpoint, params), limit, vs_currency)
+    
+    def _top_coins_request(self, limit, vs_currency):
+        """Build the coins/markets request"""
         endpoint = "coins/markets"
         params = {
             "vs_currency": vs_currency,
@@ -90,22 +652,30 @@ class CoinGeckoAPI:
             "page": 1,
             "sparkline": "false"
         }
-        
-        data = self._make_request(endpoint, params)
+        return endpoint, params
+    
+    def _store_top_coins(self, data, limit, vs_currency):
+        """Cache a coins/markets response"""
         if data:
-            self.cache[cache_key] = data
-            self.cache[f"{cache_key}_timestamp"] = time.time()
+            self.cache.set(("top_coins", limit, vs_currency), data)
             self.last_refresh = datetime.now()
             return data
         return None
     
     def get_coin_details(self, coin_id):
         """Get detailed information about a specific coin"""
-        cache_key = f"details_{coin_id}"
-        
-        if self._is_cache_valid(cache_key):
-            return self.cache[cache_key]
-        
+        cached = self._get_cached(("details", coin_id))
+        if cached is not None:
+            return cached
+        return self._fetch_coin_details(coin_id) or self._get_stale(("details", coin_id))
+    
+    def _fetch_coin_details(self, coin_id):
+        """Fetch detailed coin information and cache it"""
+        endpoint, params = self._coin_details_request(coin_id)
+        return self._store_coin_details(self._make_request(endpoint, params, label="coins/{id}"), coin_id)
+    
+    def _coin_details_request(self, coin_id):
+        """Build the coins/{id} request"""
         endpoint = f"coins/{coin_id}"
         params = {
             "localization": "false",
@@ -115,21 +685,59 @@ class CoinGeckoAPI:
             "developer_data": "false",
             "sparkline": "false"
         }
-        
-        data = self._make_request(endpoint, params)
+        return endpoint, params
+    
+    def _store_coin_details(self, data, coin_id):
+        """Cache a coins/{id} response"""
         if data:
-            self.cache[cache_key] = data
-            self.cache[f"{cache_key}_timestamp"] = time.time()
+            self.cache.set(("details", coin_id), data)
             self.last_refresh = datetime.now()
             return data
         return None
     
-    def _is_cache_valid(self, cache_key):
-        """Check if cached data is still valid"""
-        timestamp_key = f"{cache_key}_timestamp"
-        if cache_key in self.cache and timestamp_key in self.cache:
-            return time.time() - self.cache[timestamp_key] < self.cache_duration
-        return False
+    def start_background_refresh(self, hot_coin_ids=(), interval=15, lead_time=30):
+        """Start refreshing hot cache entries shortly before they expire"""
+        self.hot_coin_ids = list(hot_coin_ids)
+        if self.refresher is None:
+            self.refresher = BackgroundRefresher(self, interval=interval, lead_time=lead_time)
+        self.refresher.start()
+    
+    def stop_background_refresh(self):
+        """Stop the background refresher, if running"""
+        if self.refresher:
+            self.refresher.stop()
+    
+    def refresh_hot_keys(self, lead_time, requested=()):
+        """Refetch hot entries that expire within lead_time, plus any requested keys"""
+        due = list(requested)
+        
+        # Prices for the whole local database go out as one batch
+        hot_prices = [("price", coin_id, "usd") for coin_id in self.hot_coin_ids]
+        if any(self._refresh_due(key, lead_time) for key in hot_prices):
+            due.extend(key for key in hot_prices
+                       if self.cache.time_to_expiry(key) is None or self._refresh_due(key, lead_time))
+        
+        due.extend(key for key in [("trending",), *list(self._top_coins_keys)]
+                   if self._refresh_due(key, lead_time))
+        
+        prices_by_currency = {}
+        for key in dict.fromkeys(due):
+            if key[0] == "price":
+                prices_by_currency.setdefault(key[2], []).append(key[1])
+            elif key[0] == "trending":
+                self._fetch_trending()
+            elif key[0] == "top_coins":
+                self._fetch_top_coins(key[1], key[2])
+            elif key[0] == "details":
+                self._fetch_coin_details(key[1])
+        
+        for vs_currency, coin_ids in prices_by_currency.items():
+            self._fetch_prices(coin_ids, vs_currency)
+    
+    def _refresh_due(self, cache_key, lead_time):
+        """Whether a cached entry expires soon and is not yet too stale to keep alive"""
+        time_left = self.cache.time_to_expiry(cache_key)
+        return time_left is not None and -self.max_staleness < time_left < lead_time
     
     def format_price(self, price):
         """Format price with appropriate decimal places"""
@@ -174,3 +782,99 @@ class CoinGeckoAPI:
         if self.last_refresh:
             return self.last_refresh.strftime("%Y-%m-%d %H:%M:%S")
         return "Never"
+    
+    def get_cache_stats(self):
+        """Get cache size and hit/miss/eviction counters"""
+        return self.cache.stats()
+    
+    def get_rate_limit_stats(self):
+        """Get the client-side rate limiter's budget and counters"""
+        return self.rate_limiter.stats()
+    
+    def get_coalescing_stats(self):
+        """Get how many requests were served by an identical in-flight call"""
+        return self.inflight.stats()
+    
+    def get_connection_stats(self):
+        """Get per-endpoint counts of new and reused HTTP connections"""
+        return self.transport.get_stats()
+    
+    def get_stage_stats(self):
+        """Get latency statistics per timed stage (empty while metrics are disabled)"""
+        return self.metrics.snapshot()
+
+class AsyncCoinGeckoAPI:
+    """Asyncio front end sharing cache, rate limiter and connection pool with a CoinGeckoAPI
+    
+    Cache hits are answered on the event loop without any thread hop; only
+    the blocking HTTP call itself runs in the default executor, coalesced
+    with identical calls from both threads and other tasks.
+    """
+    
+    def __init__(self, api=None):
+        self.api = api or CoinGeckoAPI()
+    
+    def __getattr__(self, name):
+        # Formatting and stats helpers are shared with the sync client
+        return getattr(self.api, name)
+    
+    async def _make_request(self, endpoint, params=None, label=None):
+        """Make a request without blocking the event loop"""
+        if _CACHE_ONLY.get():
+            return None
+        try:
+            request_key = self.api._request_key(endpoint, params)
+            request = functools.partial(self.api._request_json, endpoint, params, label)
+            with self.api.metrics.span(f"api.{label or endpoint}"):
+                return await self.api.inflight.do_async(request_key, request)
+        except Exception as e:
+            self.api._report_request_error(e)
+            return None
+    
+    async def get_coin_price(self, coin_id, vs_currency="usd"):
+        """Get current price for a specific coin"""
+        prices = await self.get_coin_prices([coin_id], vs_currency)
+        return prices.get(coin_id)
+    
+    async def get_coin_prices(self, coin_ids, vs_currency="usd"):
+        """Get current prices for several coins with a single batched request"""
+        prices, missing = self.api._lookup_prices(coin_ids, vs_currency)
+        if missing:
+            endpoint, params = self.api._prices_request(missing, vs_currency)
+            data = await self._make_request(endpoint, params)
+            prices.update(self.api._store_prices(data, missing, vs_currency))
+            self.api._fill_stale_prices(prices, missing, vs_currency)
+        return prices
+    
+    async def get_trending_coins(self):
+        """Get trending cryptocurrencies"""
+        cached = self.api._get_cached(("trending",))
+        if cached is not None:
+            return cached
+        
+        endpoint, params = self.api._trending_request()
+        data = await self._make_request(endpoint, params)
+        return self.api._store_trending(data) or self.api._get_stale(("trending",))
+    
+    async def get_top_coins(self, limit=10, vs_currency="usd"):
+        """Get top cryptocurrencies by market cap"""
+        cache_key = ("top_coins", limit, vs_currency)
+        self.api._top_coins_keys.add(cache_key)
+        
+        cached = self.api._get_cached(cache_key)
+        if cached is not None:
+            return cached
+        
+        endpoint, params = self.api._top_coins_request(limit, vs_currency)
+        data = await self._make_request(endpoint, params)
+        return self.api._store_top_coins(data, limit, vs_currency) or self.api._get_stale(cache_key)
+    
+    async def get_coin_details(self, coin_id):
+        """Get detailed information about a specific coin"""
+        cached = self.api._get_cached(("details", coin_id))
+        if cached is not None:
+            return cached
+        
+        endpoint, params = self.api._coin_details_request(coin_id)
+        data = await self._make_request(endpoint, params, label="coins/{id}")
+        return self.api._store_coin_details(data, coin_id) or self.api._get_stale(("details", coin_id))
@@ -0,0 +1,752 @@
+#!/usr/bin/env python3
+"""
+CryptoBuddy Pro - Benchmarks
+Micro-benchmarks for the hot paths of query processing
+"""
+
+import argparse
+import asyncio
+from bisect import bisect_right
+import gc
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from colorama import init, Fore, Style
+from api_utils import AsyncCoinGeckoAPI, CoinGeckoAPI, RateLimiter
+from catalog_utils import CoinCatalog
+from chat_logic import CryptoChatBot
+from crypto_data import CRYPTO_DATABASE, CryptoIndex
+from metrics_utils import Metrics
+from nlp_utils import NLPProcessor, CryptoEntityIndex, FuzzyCoinIndex, COMMON_QUERY_WORDS
+from tabulate import tabulate
+
+# Realistic user queries covering every intent
+QUERY_CORPUS = [
+    "What's the price of Bitcoin?",
+    "How much does Ethereum cost right now?",
+    "current solana price please",
+    "What is the value of ADA today?",
+    "price of btc and eth",
+    "Compare Ethereum vs Solana",
+    "compare bitcoin and litecoin",
+    "What's the difference between Cardano and Polygon?",
+    "Which is better: ADA or ALGO?",
+    "eth versus sol for the long term",
+    "Which coin is trending?",
+    "what's hot in crypto, which coin is everyone buying",
+    "popular crypto this week",
+    "what is rising today",
+    "Give me a sustainable option",
+    "Green crypto options with low energy usage",
+    "Is there an eco-friendly blockchain?",
+    "environmental impact of bitcoin",
+    "Which coins have the lowest energy usage?",
+    "I want a low risk investment",
+    "safe investment in crypto?",
+    "I'm looking for a stable coin option",
+    "something conservative please",
+    "a secure option for my savings",
+    "Should I invest in Bitcoin?",
+    "What would you recommend for a beginner?",
+    "any advice on Chainlink?",
+    "suggest a good cryptocurrency",
+    "best crypto to buy now",
+    "What are the top 5 cryptocurrencies?",
+    "top 10 coins by market cap",
+    "show me the largest 20 cryptos",
+    "list every coin you know",
+    "Tell me about Cardano's sustainability",
+    "hello there",
+    "hi, who are you?",
+    "Tell me about stellar",
+    "what do you think about the market in general",
+    "I lost money yesterday and feel terrible",
+    "thanks, that was helpful!",
+]
+
+# Fixed end-to-end corpus: every query must be routed to the intent it is filed under
+INTENT_CORPUS = {
+    "price_query": ["What's the price of Bitcoin?", "current solana price please", "price of btc and eth",
+                    "price of btc, eth and sol"],
+    "comparison": ["Compare Ethereum vs Solana", "Which is better: ADA or ALGO?", "compare btc, eth and ada"],
+    "trending": ["Which coin is trending?", "what's hot in crypto, which coin is everyone buying",
+                 "popular crypto this week"],
+    "sustainable": ["Give me a sustainable option", "Green crypto options with low energy usage",
+                    "environmental impact of bitcoin"],
+    "low_risk": ["I want a low risk investment", "safe investment in crypto?", "something conservative please"],
+    "top_coins": ["What are the top 5 cryptocurrencies?", "top 10 coins by market cap", "top 20 coins"],
+    "advice": ["Should I invest in Bitcoin?", "any advice on Chainlink?", "best crypto to buy now"],
+    "general_query": ["hello there", "Tell me about stellar", "thanks, that was helpful!",
+                      "is polygon a good investment?"],
+}
+
+# Misspelled coin names and the coin each should resolve to
+TYPO_CORPUS = [
+    ("What's the price of bitcoinn?", "bitcoin"),
+    ("etherium vs solanna", "ethereum"),
+    ("tell me about chainlnk", "chainlink"),
+    ("is litecion a good buy", "litecoin"),
+    ("what about polygn", "polygon"),
+    ("should I invest in carddano", "cardano"),
+    ("algornad price", "algorand"),
+    ("I like tezoz", "tezos"),
+    ("etherium price", "ethereum"),
+    ("what about cardona", "cardano"),
+    ("price of etherim", "ethereum"),
+]
+
+# Misspellings timed one by one by the fuzzy benchmark, which fails if any takes over FUZZY_BUDGET_US
+FUZZY_WORDS = ["bitcoinn", "etherium", "chainlnk", "kobazen", "zenkori"]
+FUZZY_BUDGET_US = 1000.0
+
+class StubCoinGeckoAPI(CoinGeckoAPI):
+    """CoinGeckoAPI answering every request with deterministic made-up data"""
+    
+    def __init__(self, latency=0.0, **kwargs):
+        kwargs.setdefault("rate_limiter", RateLimiter(calls_per_minute=10**9, burst=10**9))
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+    
+    def _request_json(self, endpoint, params=None, label=None):
+        with self._calls_lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        
+        if endpoint == "simple/price":
+            return {
+                coin_id: {"usd": 10.0 * len(coin_id), "usd_24h_change": len(coin_id) % 7 - 3.0,
+                          "usd_market_cap": 1e9 * len(coin_id), "usd_24h_vol": 1e7 * len(coin_id)}
+                for coin_id in params["ids"].split(",")
+            }
+        if endpoint == "search/trending":
+            return {"coins": [{"item": {"name": f"Trend {i}", "symbol": f"TR{i}", "market_cap_rank": i * 10}}
+                              for i in range(1, 8)]}
+        if endpoint == "coins/markets":
+            return [{"name": f"Top {i}", "symbol": f"tp{i}", "current_price": 1000.0 / i,
+                     "price_change_percentage_24h": (-1) ** i * i / 2, "market_cap": 1e11 / i}
+                    for i in range(1, params["per_page"] + 1)]
+        if endpoint.startswith("coins/"):
+            coin_id = endpoint.split("/", 1)[1]
+            return {"id": coin_id, "name": coin_id.title(), "market_data": {"current_price": {"usd": 10.0 * len(coin_id)}}}
+        return {}
+
+def legacy_detect_intent(intent_patterns, text):
+    """The original per-pattern re.search loop, kept as the baseline"""
+    text = text.lower()
+    detected_intents = []
+    
+    for intent, patterns in intent_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                detected_intents.append(intent)
+                break
+    
+    return detected_intents if detected_intents else ['general_query']
+
+LEGACY_CRYPTO_PATTERNS = [
+    r'\bbitcoin\b', r'\bbtc\b', r'\bethereum\b', r'\beth\b', r'\bcardano\b', r'\bada\b',
+    r'\bsolana\b', r'\bsol\b', r'\bpolygon\b', r'\bmatic\b', r'\balgorand\b', r'\balgo\b',
+    r'\bchainlink\b', r'\blink\b', r'\blitecoin\b', r'\bltc\b', r'\bstellar\b', r'\bxlm\b',
+    r'\btezos\b', r'\bxtz\b'
+]
+
+def legacy_extract_cryptocurrencies(text):
+    """The original hard-coded findall loop with quadratic dedupe, kept as the baseline"""
+    text = text.lower()
+    found_cryptos = []
+    
+    for pattern in LEGACY_CRYPTO_PATTERNS:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        found_cryptos.extend(matches)
+    
+    unique_cryptos = []
+    for crypto in found_cryptos:
+        crypto = crypto.lower()
+        if crypto not in [c.lower() for c in unique_cryptos]:
+            unique_cryptos.append(crypto)
+    
+    return unique_cryptos
+
+def legacy_get_crypto_by_name(crypto_database, name):
+    """The original dict lookup with a substring scan fallback, kept as the baseline"""
+    name = name.lower()
+    if name in crypto_database:
+        return crypto_database[name]
+    
+    for key, crypto in crypto_database.items():
+        if name in key or name in crypto["name"].lower():
+            return crypto
+    return None
+
+def legacy_get_sustainable_cryptos(crypto_database, min_score=7):
+    """The original full scan for sustainable coins, kept as the baseline"""
+    return [crypto for crypto in crypto_database.values() if crypto["sustainability_score"] >= min_score]
+
+def synthetic_catalog(size):
+    """A coin database of the given size with unique made-up names and symbols"""
+    energy_levels = ["very_low", "low", "medium", "high"]
+    risk_levels = ["low", "medium", "high", "very_high"]
+    catalog = {}
+    for i in range(size):
+        key = f"coin-{i}"
+        catalog[key] = {
+            "name": f"Synthetic Coin {i}",
+            "symbol": f"SYN{i}",
+            "coingecko_id": key,
+            "energy_use": energy_levels[i % 4],
+            "sustainability_score": i % 10 + 1,
+            "risk_level": risk_levels[i // 4 % 4]
+        }
+    return catalog
+
+def synthetic_coin_list(size):
+    """A coins/list style dump where, as on CoinGecko, many coins share a ticker"""
+    return [
+        {"id": f"synthetic-coin-{i}", "symbol": f"syn{i % 3000}", "name": f"Synthetic Coin {i}"}
+        for i in range(size)
+    ]
+
+def pronounceable_coin_list(size, seed=7):
+    """A coins/list style dump with short made-up names that look like real coin names"""
+    rng = random.Random(seed)
+    syllables = ["ba", "ko", "ri", "zen", "lu", "mi", "ta", "vex", "no", "dra", "qi", "sol", "po", "fi", "um", "chain"]
+    coins = []
+    for i in range(size):
+        name = "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title()
+        coins.append({"id": f"{name.lower()}-{i}", "symbol": name[:4].lower(), "name": name})
+    return coins
+
+def legacy_load_coin_list(path):
+    """Keep the parsed dicts and index them by id and symbol, the baseline for the catalog"""
+    with open(path, encoding="utf-8") as f:
+        coins = json.load(f)
+    by_id = {coin["id"]: coin for coin in coins}
+    by_symbol = {}
+    for coin in coins:
+        by_symbol.setdefault(coin["symbol"], coin)
+    return coins, by_id, by_symbol
+
+def measure_load(load, path):
+    """Seconds to run load(path) and bytes the result holds on to"""
+    gc.collect()
+    start = time.perf_counter()
+    load(path)
+    elapsed = time.perf_counter() - start
+    
+    # Tracing slows allocation down, so memory is measured on a second, untimed load
+    gc.collect()
+    tracemalloc.start()
+    loaded = load(path)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del loaded
+    return elapsed, retained
+
+def time_per_call(fn, inputs, rounds=200, repeat=5):
+    """Best-of-repeat average microseconds per call of fn over inputs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for item in inputs:
+                fn(item)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+    return best / (rounds * len(inputs)) * 1e6
+
+def print_comparison(title, baseline_us, optimized_us):
+    """Print a baseline vs optimized timing line"""
+    speedup = baseline_us / optimized_us if optimized_us else float("inf")
+    print(f"{Fore.CYAN}{title}{Style.RESET_ALL}")
+    print(f"   Baseline:  {baseline_us:8.2f} µs/query")
+    print(f"   Optimized: {optimized_us:8.2f} µs/query")
+    print(f"   Speedup:   {Fore.GREEN}{speedup:8.1f}x{Style.RESET_ALL}")
+
+def bench_intents(args):
+    """Compare the compiled intent matcher with the per-pattern loop"""
+    nlp = NLPProcessor()
+    
+    mismatches = [query for query in QUERY_CORPUS
+                  if nlp.detect_intent(query) != legacy_detect_intent(nlp.intent_patterns, query)]
+    if mismatches:
+        print(f"{Fore.RED}❌ Matcher disagrees with the baseline on: {mismatches}{Style.RESET_ALL}")
+        return 1
+    
+    baseline = time_per_call(lambda q: legacy_detect_intent(nlp.intent_patterns, q), QUERY_CORPUS, args.rounds)
+    optimized = time_per_call(nlp.detect_intent, QUERY_CORPUS, args.rounds)
+    print_comparison(f"Intent detection ({len(QUERY_CORPUS)} queries)", baseline, optimized)
+    return 0
+
+def bench_entities(args):
+    """Compare the token-trie extractor with the hard-coded pattern loop"""
+    nlp = NLPProcessor()
+    
+    baseline = time_per_call(legacy_extract_cryptocurrencies, QUERY_CORPUS, args.rounds)
+    optimized = time_per_call(nlp.crypto_index.find_all, QUERY_CORPUS, args.rounds)
+    print_comparison(f"Entity extraction ({len(CRYPTO_DATABASE)} coins)", baseline, optimized)
+    
+    # The trie's cost should not grow with the number of coins
+    large_index = CryptoEntityIndex({**CRYPTO_DATABASE, **synthetic_catalog(10000)})
+    scaled = time_per_call(large_index.find_all, QUERY_CORPUS, args.rounds)
+    print(f"   With 10,000 more coins: {scaled:8.2f} µs/query")
+    
+    # Catalog coins are found by id, name or symbol; everyday words are not mistaken for coins
+    coins = [{"id": "dogecoin", "symbol": "doge", "name": "Dogecoin"}, *pronounceable_coin_list(10000)]
+    ignore = nlp.stop_words | nlp.intent_matcher.keywords | COMMON_QUERY_WORDS
+    catalog_index = CryptoEntityIndex(CRYPTO_DATABASE, CoinCatalog(coins), ignore)
+    expected = {query: nlp.crypto_index.find_all(query) for query in QUERY_CORPUS}
+    expected.update({"compare dogecoin and bitcoin": ["dogecoin", "bitcoin"], "price of doge": ["dogecoin"]})
+    wrong = [(query, found) for query, found in ((query, catalog_index.find_all(query)) for query in expected)
+             if found != expected[query]]
+    if wrong:
+        print(f"{Fore.RED}❌ Misresolved with a coin list loaded: {wrong}{Style.RESET_ALL}")
+        return 1
+    with_catalog = time_per_call(catalog_index.find_all, QUERY_CORPUS, args.rounds)
+    print(f"   With a 10,001 coin list: {with_catalog:8.2f} µs/query")
+    return 0
+
+def bench_lookups(args):
+    """Compare the prebuilt crypto_data indexes with linear scans over 10,000 coins"""
+    catalog = {**CRYPTO_DATABASE, **synthetic_catalog(10000)}
+    index = CryptoIndex(catalog)
+    names = ["bitcoin", "matic-network", "synthetic coin 9999", "chain", "synthetic coin 99", "nonexistent"]
+    
+    def indexed_get_crypto_by_name(name):
+        return index.by_name.get(name) or index.find_prefix(name)
+    
+    baseline = time_per_call(lambda name: legacy_get_crypto_by_name(catalog, name), names, max(args.rounds // 20, 1))
+    optimized = time_per_call(indexed_get_crypto_by_name, names, args.rounds)
+    print_comparison(f"Name lookup ({len(catalog)} coins)", baseline, optimized)
+    
+    scores = [9, 7, 5]
+    baseline = time_per_call(lambda score: legacy_get_sustainable_cryptos(catalog, score), scores, max(args.rounds // 20, 1))
+    optimized = time_per_call(
+        lambda score: index.by_sustainability[:bisect_right(index.sustainability_keys, -score)],
+        scores, max(args.rounds // 20, 1)
+    )
+    print_comparison(f"Sustainability threshold ({len(catalog)} coins)", baseline, optimized)
+    return 0
+
+def bench_catalog(args):
+    """Compare the columnar coin catalog with keeping the parsed coins/list dicts"""
+    for size in (10000, 100000):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "coins_list.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(synthetic_coin_list(size), f)
+            
+            baseline_time, baseline_bytes = measure_load(legacy_load_coin_list, path)
+            catalog_time, catalog_bytes = measure_load(CoinCatalog.load, path)
+        
+        print(f"{Fore.CYAN}Coin catalog ({size:,} coins){Style.RESET_ALL}")
+        print(f"   Baseline:  {baseline_bytes / 2**20:8.1f} MiB retained, {baseline_time * 1000:8.1f} ms load")
+        print(f"   Catalog:   {catalog_bytes / 2**20:8.1f} MiB retained, {catalog_time * 1000:8.1f} ms load")
+        print(f"   Saved:     {Fore.GREEN}{1 - catalog_bytes / baseline_bytes:8.0%}{Style.RESET_ALL} of memory")
+    return 0
+
+def bench_fuzzy(args):
+    """Time misspelled-name resolution against 10,000 coin names"""
+    catalog = CoinCatalog(pronounceable_coin_list(10000))
+    nlp = NLPProcessor()
+    index = FuzzyCoinIndex.from_database(CRYPTO_DATABASE, catalog)
+    
+    ignore = nlp.stop_words | nlp.intent_matcher.keywords | COMMON_QUERY_WORDS
+    wrong = [(query, expected) for query, expected in TYPO_CORPUS if expected not in index.find_all(query, ignore)]
+    if wrong:
+        print(f"{Fore.RED}❌ Misresolved: {wrong}{Style.RESET_ALL}")
+        return 1
+    
+    rounds = max(args.rounds // 10, 1)
+    typos = time_per_call(lambda query: index.find_all(query, ignore), [query for query, _ in TYPO_CORPUS], rounds)
+    # Top-5 suggestions, including names in the densest parts of the made-up catalog
+    words = {word: time_per_call(index.search, [word], rounds) for word in FUZZY_WORDS}
+    slowest = max(words, key=words.get)
+    unrelated = time_per_call(lambda query: index.find_all(query, ignore), QUERY_CORPUS, rounds)
+    
+    print(f"{Fore.CYAN}Fuzzy coin names ({len(index.terms):,} terms){Style.RESET_ALL}")
+    print(f"   Single word:     {sum(words.values()) / len(words):8.2f} µs/lookup "
+          f"(slowest {words[slowest]:.2f} µs for {slowest!r})")
+    print(f"   Typo queries:    {typos:8.2f} µs/query")
+    print(f"   Regular queries: {unrelated:8.2f} µs/query")
+    if words[slowest] > FUZZY_BUDGET_US:
+        print(f"{Fore.RED}❌ Lookups must stay under {FUZZY_BUDGET_US:.0f} µs{Style.RESET_ALL}")
+        return 1
+    return 0
+
+def bench_responses(args):
+    """Compare rendering every answer with reusing cached renders on warm API data"""
+    bot = CryptoChatBot(api=StubCoinGeckoAPI())
+    queries = [query for query in QUERY_CORPUS
+               if bot._primary_intent(bot.nlp.detect_intent(query)) in bot.INTENT_DATA]
+    analyses = [bot._analyze(query) for query in queries]
+    pairs = list(zip(queries, analyses))
+    
+    # Warm the API cache so both runs render from the same data
+    rendered = [bot._respond(query, analysis) for query, analysis in pairs]
+    reused = [bot._respond(query, analysis) for query, analysis in pairs]
+    if rendered != reused:
+        print(f"{Fore.RED}❌ Cached responses differ from fresh renders{Style.RESET_ALL}")
+        return 1
+    
+    def render(pair):
+        bot.response_cache.clear()
+        bot._respond(*pair)
+    
+    baseline = time_per_call(render, pairs, args.rounds)
+    optimized = time_per_call(lambda pair: bot._respond(*pair), pairs, args.rounds)
+    print_comparison(f"Response rendering ({len(pairs)} data-backed queries)", baseline, optimized)
+    return 0
+
+def table_cases(api):
+    """(table, rows) pairs shaped like every grid handler's output, plus awkward cells"""
+    coins = list(CRYPTO_DATABASE.values())
+    changes = [12.5, -3.25, 0.0, None, -0.004, 105.0]
+    prices = [64250.12, 0.4312, 0.00001234, None, 1.0, 2.5]
+    caps = [1.26e12, 8.1e9, 4.2e6, None, 950.0, 3.3e3]
+    
+    def cycle(values, i):
+        return values[i % len(values)]
+    
+    comparison = [[f"{c['icon']} {c['name']}", c['symbol'], api.format_price(cycle(prices, i)),
+                   api.format_change(cycle(changes, i)), c['energy_use'].title(),
+                   f"{c['sustainability_score']}/10", c['risk_level'].title()] for i, c in enumerate(coins[:3])]
+    sustainable = [[f"{c['icon']} {c['name']}", c['symbol'], api.format_price(cycle(prices, i)),
+                    c['energy_use'].replace('_', ' ').title(), f"{c['sustainability_score']}/10", c['consensus']]
+                   for i, c in enumerate(coins)]
+    low_risk = [[f"{c['icon']} {c['name']}", c['symbol'], api.format_price(cycle(prices, i)),
+                 api.format_market_cap(cycle(caps, i)), c['risk_level'].title(), str(c['launch_year'])]
+                for i, c in enumerate(coins)]
+    top = [[i, name, symbol, api.format_price(cycle(prices, i)), api.format_change(cycle(changes, i)),
+            api.format_market_cap(cycle(caps, i))]
+           for i, (name, symbol) in enumerate([("Bitcoin", "BTC"), ("比特币", "BTC"), ("  Padded  ", "PAD"),
+                                               ("Ünïcödé", "UNI"), ("", ""), ("Tab\tcoin", "TAB"),
+                                               ("Top 7", "TP7"), ("Top 8", "TP8"), ("Top 9", "TP9"),
+                                               ("Top 10", "T10")], 1)]
+    
+    return [
+        (CryptoChatBot.COMPARISON_TABLE, comparison),
+        (CryptoChatBot.SUSTAINABLE_TABLE, sustainable),
+        (CryptoChatBot.LOW_RISK_TABLE, low_risk),
+        (CryptoChatBot.TOP_COINS_TABLE, top),
+        (CryptoChatBot.TOP_COINS_TABLE, top[:1]),
+        (CryptoChatBot.TOP_COINS_TABLE, []),
+        # Layouts handed to tabulate: numeric-looking text, a non-year, a multi-line name
+        (CryptoChatBot.TOP_COINS_TABLE, [[1, "Bitcoin", "1", "$1.00", "N/A", "N/A"], [2, "Two", "2", "$2.00", "N/A", "N/A"]]),
+        (CryptoChatBot.LOW_RISK_TABLE, [row[:5] + ["N/A"] for row in low_risk]),
+        (CryptoChatBot.TOP_COINS_TABLE, [[1, "Multi\nline", "ML", "$1.00", "N/A", "N/A"]]),
+    ]
+
+def bench_tables(args):
+    """Compare the grid table renderer with tabulate and check the output is identical"""
+    cases = table_cases(CoinGeckoAPI())
+    
+    wrong = [index for index, (table, rows) in enumerate(cases)
+             if table.render(rows) != tabulate(rows, headers=table.headers, tablefmt="grid")]
+    if wrong:
+        print(f"{Fore.RED}❌ Tables differ from tabulate in cases {wrong}{Style.RESET_ALL}")
+        return 1
+    
+    handler_cases = cases[:4]
+    baseline = time_per_call(lambda case: tabulate(case[1], headers=case[0].headers, tablefmt="grid"),
+                             handler_cases, args.rounds)
+    optimized = time_per_call(lambda case: case[0].render(case[1]), handler_cases, args.rounds)
+    print_comparison(f"Grid tables ({len(handler_cases)} handler layouts)", baseline, optimized)
+    return 0
+
+def bench_metrics(args):
+    """Cost of stage timing on warm process_query calls, with metrics off and on"""
+    queries = [query for queries in INTENT_CORPUS.values() for query in queries]
+    bots = {}
+    for enabled in (False, True):
+        bot = CryptoChatBot(api=StubCoinGeckoAPI(metrics=Metrics(enabled=enabled)))
+        for query in queries:
+            bot.process_query(query)
+        bots[enabled] = bot
+    
+    rounds = max(args.rounds // 10, 5)
+    disabled = time_per_call(bots[False].process_query, queries, rounds)
+    enabled = time_per_call(bots[True].process_query, queries, rounds)
+    spans = sum(stats["count"] for stats in bots[True].metrics.snapshot().values())
+    queries_timed = bots[True].metrics.snapshot()["query"]["count"]
+    
+    idle = Metrics(enabled=False)
+    
+    def idle_span(_):
+        with idle.span("stage"):
+            pass
+    
+    span_ns = time_per_call(idle_span, range(100), args.rounds) * 1000
+    print(f"{Fore.CYAN}Stage metrics on process_query ({len(queries)} warm queries){Style.RESET_ALL}")
+    print(f"   Disabled:  {disabled:8.2f} µs/query ({span_ns:.0f} ns per disabled span)")
+    print(f"   Enabled:   {enabled:8.2f} µs/query ({spans / queries_timed:.1f} spans per query)")
+    print(f"   Overhead:  {(enabled / disabled - 1) * 100:+8.1f}% when enabled")
+    return 0
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+def summarize(latencies, elapsed, peaks, retained):
+    """Latency percentiles (µs), throughput and memory per query for one run"""
+    latencies = sorted(latencies)
+    return {
+        "queries": len(latencies),
+        "p50_us": round(percentile(latencies, 0.50) * 1e6, 1),
+        "p95_us": round(percentile(latencies, 0.95) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 1),
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 1),
+        "throughput_qps": round(len(latencies) / elapsed, 1),
+        "peak_alloc_kib": round(sum(peaks) / len(peaks) / 1024, 1),
+        "retained_bytes": round(sum(retained) / len(retained))
+    }
+
+def measure_queries(bot, queries, samples, cold):
+    """Time process_query over queries, then trace its memory in a separate untimed pass"""
+    def reset():
+        if cold:
+            bot.api.cache.clear()
+            bot.response_cache.clear()
+    
+    for query in queries:
+        bot.process_query(query)
+    
+    latencies = []
+    elapsed = 0.0
+    for _ in range(samples):
+        for query in queries:
+            reset()
+            start = time.perf_counter()
+            bot.process_query(query)
+            took = time.perf_counter() - start
+            latencies.append(took)
+            elapsed += took
+    
+    peaks, retained = [], []
+    for query in queries:
+        reset()
+        gc.collect()
+        tracemalloc.start()
+        bot.process_query(query)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        retained.append(current)
+    return summarize(latencies, elapsed, peaks, retained)
+
+def print_query_results(results, baseline=None):
+    """Print the per-intent table, with the change against a baseline run if given"""
+    print(f"{'':14} {'':4}  {'p50 µs':>9} {'p95 µs':>9} {'p99 µs':>9} {'q/s':>9} {'peak KiB':>9}")
+    for intent, runs in results.items():
+        for mode, stats in runs.items():
+            line = (f"{intent if mode == 'cold' else '':14} {mode:4}  {stats['p50_us']:9.1f} {stats['p95_us']:9.1f} "
+                    f"{stats['p99_us']:9.1f} {stats['throughput_qps']:9.0f} {stats['peak_alloc_kib']:9.1f}")
+            previous = (baseline or {}).get(intent, {}).get(mode)
+            if previous:
+                change = stats["p50_us"] / previous["p50_us"] - 1 if previous["p50_us"] else 0.0
+                color = Fore.RED if change > 0.10 else Fore.GREEN if change < -0.10 else ""
+                line += f"  {color}{change:+6.0%} p50 vs baseline{Style.RESET_ALL}"
+            print(line)
+
+def bench_queries(args):
+    """End-to-end process_query latency per intent, cold and warm, on the stub API"""
+    bot = CryptoChatBot(api=StubCoinGeckoAPI(latency=args.latency))
+    misrouted = {query: bot._primary_intent(bot.nlp.detect_intent(query))
+                 for intent, queries in INTENT_CORPUS.items() for query in queries
+                 if bot._primary_intent(bot.nlp.detect_intent(query)) != intent}
+    if misrouted:
+        print(f"{Fore.RED}❌ Corpus queries routed to other intents: {misrouted}{Style.RESET_ALL}")
+        return 1
+    
+    random.seed(0)
+    results = {}
+    for intent, queries in INTENT_CORPUS.items():
+        results[intent] = {
+            "cold": measure_queries(bot, queries, args.samples, cold=True),
+            "warm": measure_queries(bot, queries, args.samples, cold=False)
+        }
+    everything = [query for queries in INTENT_CORPUS.values() for query in queries]
+    overall = {
+        "cold": measure_queries(bot, everything, args.samples, cold=True),
+        "warm": measure_queries(bot, everything, args.samples, cold=False)
+    }
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            previous = json.load(f)
+        baseline = {**previous["intents"], "all": previous["overall"]}
+    
+    print(f"{Fore.CYAN}process_query per intent ({args.samples} samples per query, "
+          f"{args.latency * 1000:.0f} ms stub latency){Style.RESET_ALL}")
+    print_query_results({**results, "all": overall}, baseline)
+    
+    if args.json:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "samples": args.samples,
+            "stub_latency_s": args.latency,
+            "intents": results,
+            "overall": overall
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"   Results written to {args.json}")
+    return 0
+
+def bench_stress(args):
+    """Hammer one shared chatbot from a thread pool and check every answer"""
+    queries = [QUERY_CORPUS[i % len(QUERY_CORPUS)] for i in range(args.queries)]
+    
+    # Serial answers to compare with; queries with a random reply are only checked for errors
+    reference_bot = CryptoChatBot(api=StubCoinGeckoAPI())
+    expected = {}
+    for query in QUERY_CORPUS:
+        answers = {reference_bot.process_query(query) for _ in range(10)}
+        expected[query] = answers.pop() if len(answers) == 1 else None
+    
+    # Short TTLs and a small cache force expiry, eviction and refetching under load
+    api = StubCoinGeckoAPI(latency=0.002, cache_ttls={"price": 0.05, "top_coins": 0.05, "trending": 0.05},
+                           max_cache_entries=16, max_staleness=0)
+    bot = CryptoChatBot(api=api)
+    api.start_background_refresh(hot_coin_ids=[crypto["coingecko_id"] for crypto in CRYPTO_DATABASE.values()],
+                                 interval=0.01, lead_time=0.04)
+    
+    def check(query):
+        response = bot.process_query(query)
+        if "I encountered an error" in response:
+            return "error"
+        if expected[query] is not None and response != expected[query]:
+            return "mismatch"
+        return "ok"
+    
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            outcomes = list(pool.map(check, queries))
+    finally:
+        api.stop_background_refresh()
+    elapsed = time.perf_counter() - start
+    
+    errors, mismatches = outcomes.count("error"), outcomes.count("mismatch")
+    
+    # A request cancelled by a timeout must not leave its key in flight for everyone after it
+    if not asyncio.run(cancelled_leader_case(StubCoinGeckoAPI(latency=0.2))):
+        errors += 1
+        print(f"{Fore.RED}❌ A cancelled request left its coalesced fetch stuck in flight{Style.RESET_ALL}")
+    cache_stats = api.get_cache_stats()
+    print(f"{Fore.CYAN}Stress ({len(queries):,} queries on {args.threads} threads, one shared bot){Style.RESET_ALL}")
+    print(f"   Throughput:  {len(queries) / elapsed:8.0f} queries/s")
+    print(f"   API calls:   {api.calls:8d} ({api.get_coalescing_stats()['coalesced']} coalesced)")
+    print(f"   Cache:       {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions")
+    color = Fore.GREEN if errors == mismatches == 0 else Fore.RED
+    print(f"   Problems:    {color}{errors} errors, {mismatches} wrong answers{Style.RESET_ALL}")
+    return 0 if errors == mismatches == 0 else 1
+
+def bench_batch(args):
+    """Compare answering queries one by one in a loop with process_queries, checked for identical answers"""
+    queries = [QUERY_CORPUS[i % len(QUERY_CORPUS)] for i in range(args.queries)]
+    # Load the lazily imported NLP data first so neither run pays for it
+    CryptoChatBot(api=StubCoinGeckoAPI()).process_queries(QUERY_CORPUS)
+    
+    def run(answer):
+        bot = CryptoChatBot(api=StubCoinGeckoAPI(latency=args.latency))
+        start = time.perf_counter()
+        responses = answer(bot)
+        return responses, time.perf_counter() - start, bot
+    
+    looped, loop_elapsed, loop_bot = run(lambda bot: [bot.process_query(query) for query in queries])
+    batched, batch_elapsed, batch_bot = run(lambda bot: bot.process_queries(queries))
+    
+    # Random friendly replies legitimately differ between the two runs
+    friendly = loop_bot._friendly_texts
+    mismatches = [query for query, expected, actual in zip(queries, looped, batched)
+                  if expected != actual and not any(text in expected or text in actual for text in friendly)]
+    
+    print(f"{Fore.CYAN}Batch ({len(queries):,} queries, {args.latency * 1000:.0f} ms stub latency){Style.RESET_ALL}")
+    print(f"   process_query loop: {loop_elapsed:8.2f} s  {loop_bot.api.calls:6d} API calls")
+    print(f"   process_queries:    {batch_elapsed:8.2f} s  {batch_bot.api.calls:6d} API calls  "
+          f"{Fore.GREEN}{loop_elapsed / batch_elapsed:.1f}x{Style.RESET_ALL}")
+    if mismatches:
+        print(f"{Fore.RED}❌ process_queries answered {len(mismatches)} queries differently, "
+              f"e.g. {mismatches[0]!r}{Style.RESET_ALL}")
+        return 1
+    return 0
+
+async def cancelled_leader_case(api):
+    """Time out a coalesced request while its fetch is still queued, then ask again
+    
+    Returns whether the later request was answered and nothing stayed in flight.
+    """
+    async_api = AsyncCoinGeckoAPI(api)
+    loop = asyncio.get_running_loop()
+    
+    # Fill the default executor so the leader's fetch has to wait in its queue
+    release = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=2)
+    loop.set_default_executor(executor)
+    blockers = [loop.run_in_executor(None, release.wait) for _ in range(2)]
+    try:
+        await asyncio.wait_for(async_api.get_trending_coins(), timeout=0.05)
+    except asyncio.TimeoutError:
+        pass
+    release.set()
+    await asyncio.gather(*blockers)
+    
+    try:
+        trending = await asyncio.wait_for(async_api.get_trending_coins(), timeout=2.0)
+    except asyncio.TimeoutError:
+        trending = None
+    executor.shutdown(wait=False)
+    return bool(trending) and api.get_coalescing_stats()["in_flight"] == 0
+
+BENCHMARKS = {
+    "intents": bench_intents,
+    "entities": bench_entities,
+    "lookups": bench_lookups,
+    "catalog": bench_catalog,
+    "fuzzy": bench_fuzzy,
+    "responses": bench_responses,
+    "tables": bench_tables,
+    "queries": bench_queries,
+    "metrics": bench_metrics,
+    "stress": bench_stress,
+    "batch": bench_batch,
+}
+
+def main(argv=None):
+    """Run the selected benchmarks"""
+    parser = argparse.ArgumentParser(description="CryptoBuddy Pro benchmarks")
+    parser.add_argument("benchmarks", nargs="*", choices=[[], *BENCHMARKS], default=[],
+                        help="benchmarks to run (default: all)")
+    parser.add_argument("--rounds", type=int, default=200, help="passes over the corpus per timing")
+    parser.add_argument("--queries", type=int, default=5000, help="queries sent by the stress and batch benchmarks")
+    parser.add_argument("--threads", type=int, default=32, help="threads used by the stress benchmark")
+    parser.add_argument("--samples", type=int, default=50, help="timed runs per query in the queries benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stub API waits per request")
+    parser.add_argument("--json", help="write the queries benchmark results to this JSON file")
+    parser.add_argument("--baseline", help="earlier --json results to compare the queries benchmark with")
+    args = parser.parse_args(argv)
+    init()
+    
+    status = 0
+    for name in args.benchmarks or BENCHMARKS:
+        status |= BENCHMARKS[name](args)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+"""
+CryptoBuddy Pro - Cache Utilities
+Bounded in-memory caching for API responses with optional persistence
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from colorama import Fore, Style
+
+class _CacheShard:
+    """One lock-protected LRU segment of a TTLCache"""
+    
+    def __init__(self, max_entries):
+        # key -> (value, fetched_at, expires_at), least recently used first
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.store_hits = 0
+        self.stale_hits = 0
+
+class TTLCache:
+    """Bounded cache with per-endpoint TTLs and LRU eviction
+    
+    Keys are tuples whose first element names the endpoint, e.g.
+    ("price", "bitcoin", "usd") or ("trending",), so the TTL for an
+    entry can be looked up without building any strings. Expired entries
+    stay around until evicted so they can still be served as stale data.
+    
+    Entries are spread over shards by key hash, each with its own lock
+    and LRU order, so threads looking up different keys rarely contend.
+    Each shard evicts on its own, so the cache is only approximately LRU
+    overall; shards are kept to at least MIN_SHARD_ENTRIES entries, and
+    small caches use a single shard and stay exactly LRU.
+    """
+    
+    MIN_SHARD_ENTRIES = 64
+    
+    def __init__(self, default_ttl=300, ttls=None, max_entries=1024, store=None, shards=16):
+        """Create an empty cache holding at most max_entries items
+        
+        If a persistent store is given, misses fall through to it and
+        every write is also persisted, so restarts begin warm.
+        """
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.max_entries = max_entries
+        self.store = store
+        
+        shards = max(1, min(shards, max_entries // self.MIN_SHARD_ENTRIES))
+        self._shards = [_CacheShard(max_entries // shards + (i < max_entries % shards)) for i in range(shards)]
+    
+    def _shard(self, key):
+        """Get the shard that owns a key"""
+        return self._shards[hash(key) % len(self._shards)]
+    
+    def fetched_at(self, key):
+        """When the cached value for a key was fetched, fresh or not, or None if absent"""
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            return entry[1] if entry is not None else None
+    
+    def ttl_for(self, key):
+        """Get the time-to-live for a key based on its endpoint"""
+        return self.ttls.get(key[0], self.default_ttl)
+    
+    def get(self, key):
+        """Get a fresh value, or None if the key is missing or expired"""
+        now = time.time()
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    shard.entries.move_to_end(key)
+                    shard.hits += 1
+                    return entry[0]
+                
+                shard.expirations += 1
+            
+            if self.store is None:
+                shard.misses += 1
+                return None
+        
+        # Another process (or a previous run) may already have fetched it
+        persisted = self.store.load(key)
+        if persisted is not None:
+            value, fetched_at = persisted
+            if fetched_at + self.ttl_for(key) > now:
+                self._insert(key, value, fetched_at)
+                with shard.lock:
+                    shard.hits += 1
+                    shard.store_hits += 1
+                return value
+        
+        with shard.lock:
+            shard.misses += 1
+        return None
+    
+    def get_stale(self, key, max_staleness=None):
+        """Get a value even if expired, unless it expired more than max_staleness seconds ago"""
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                return None
+            if max_staleness is not None and entry[2] + max_staleness <= time.time():
+                return None
+            
+            shard.stale_hits += 1
+            return entry[0]
+    
+    def time_to_expiry(self, key):
+        """Seconds until a key expires (negative once expired), or None if absent"""
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                return None
+            return entry[2] - time.time()
+    
+    def set(self, key, value, fetched_at=None):
+        """Store a value, evicting the least recently used entries if full"""
+        if fetched_at is None:
+            fetched_at = time.time()
+        
+        self._insert(key, value, fetched_at)
+        if self.store is not None:
+            self.store.save(key, value, fetched_at)
+    
+    def _insert(self, key, value, fetched_at):
+        """Add an entry to the in-memory LRU only"""
+        expires_at = fetched_at + self.ttl_for(key)
+        
+        shard = self._shard(key)
+        with shard.lock:
+            shard.entries[key] = (value, fetched_at, expires_at)
+            shard.entries.move_to_end(key)
+            
+            while len(shard.entries) > shard.max_entries:
+                shard.entries.popitem(last=False)
+                shard.evictions += 1
+    
+    def clear(self):
+        """Remove all entries"""
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+    
+    def stats(self):
+        """Get cache size and hit/miss/eviction counters"""
+        totals = dict.fromkeys(("entries", "hits", "misses", "evictions", "expirations", "store_hits", "stale_hits"), 0)
+        for shard in self._shards:
+            with shard.lock:
+                totals["entries"] += len(shard.entries)
+                totals["hits"] += shard.hits
+                totals["misses"] += shard.misses
+                totals["evictions"] += shard.evictions
+                totals["expirations"] += shard.expirations
+                totals["store_hits"] += shard.store_hits
+                totals["stale_hits"] += shard.stale_hits
+        
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            "entries": totals["entries"],
+            "max_entries": self.max_entries,
+            "hits": totals["hits"],
+            "misses": totals["misses"],
+            "hit_rate": totals["hits"] / lookups if lookups else 0.0,
+            "evictions": totals["evictions"],
+            "expirations": totals["expirations"],
+            "store_hits": totals["store_hits"],
+            "stale_hits": totals["stale_hits"],
+            "persistent": self.store is not None,
+            "store_busy": self.store.busy if self.store is not None else 0,
+            "shards": len(self._shards)
+        }
+    
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self._shards)
+
+# Primary SQLite result codes meaning another connection holds a lock right now:
+# SQLITE_BUSY, SQLITE_LOCKED and SQLITE_PROTOCOL (a lost race for a WAL lock)
+TRANSIENT_SQLITE_CODES = frozenset({5, 6, 15})
+
+def _is_transient(error):
+    """Whether a sqlite3 error will likely go away if the statement is simply retried later"""
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        # Extended codes such as SQLITE_BUSY_SNAPSHOT keep the primary code in the low byte
+        return code & 0xFF in TRANSIENT_SQLITE_CODES
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+class SQLiteCacheStore:
+    """Persistent cache backend shared by every process on the host
+    
+    The database is opened in WAL mode on first use, so readers never
+    block the writer and several workers can share one file. A database
+    that stays locked past the timeout only costs that one lookup (a
+    miss) or write (skipped); the store is disabled only when the file
+    is corrupt, unreadable or unwritable.
+    """
+    
+    def __init__(self, path, max_age=86400):
+        """Remember the database path; nothing is opened until first access"""
+        self.path = os.path.expanduser(path)
+        self.max_age = max_age
+        self._connection = None
+        self._disabled = False
+        self._lock = threading.Lock()
+        
+        # Statements given up on because the database was locked
+        self.busy = 0
+        self._warned_busy = False
+    
+    def _connect(self):
+        """Open the database and drop entries older than max_age"""
+        connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            connection.execute("DELETE FROM cache WHERE fetched_at < ?", (time.time() - self.max_age,))
+            connection.commit()
+        except sqlite3.Error:
+            connection.close()
+            raise
+        return connection
+    
+    def _execute(self, sql, params, commit=False):
+        """Run a statement; a locked database skips it, an unusable one disables the store"""
+        with self._lock:
+            if self._disabled:
+                return None
+            try:
+                if self._connection is None:
+                    self._connection = self._connect()
+                cursor = self._connection.execute(sql, params)
+                row = cursor.fetchone()
+                if commit:
+                    self._connection.commit()
+                self._warned_busy = False
+                return row
+            except sqlite3.Error as e:
+                if _is_transient(e):
+                    self._skip_busy(e)
+                else:
+                    print(f"{Fore.YELLOW}⚠️  Persistent cache disabled: {e}{Style.RESET_ALL}")
+                    self._disabled = True
+                return None
+    
+    def _skip_busy(self, error):
+        """Give up on one statement while another process holds the database"""
+        self.busy += 1
+        if self._connection is not None and self._connection.in_transaction:
+            try:
+                self._connection.rollback()
+            except sqlite3.Error:
+                pass
+        
+        # Warn once per run of locked statements rather than on every one
+        if not self._warned_busy:
+            self._warned_busy = True
+            print(f"{Fore.YELLOW}⚠️  Persistent cache busy, skipping it for now: {error}{Style.RESET_ALL}")
+    
+    def load(self, key):
+        """Get (value, fetched_at) for a key, or None"""
+        row = self._execute("SELECT value, fetched_at FROM cache WHERE key = ?", (json.dumps(key),))
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+    
+    def save(self, key, value, fetched_at):
+        """Persist an entry unless a newer one is already stored"""
+        self._execute(
+            "INSERT INTO cache (key, value, fetched_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, fetched_at = excluded.fetched_at "
+            "WHERE excluded.fetched_at > cache.fetched_at",
+            (json.dumps(key), json.dumps(value), fetched_at),
+            commit=True
+        )
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,166 @@
+"""
+CryptoBuddy Pro - Coin Catalog Utilities
+Compact in-memory index of the full CoinGecko coin list
+"""
+
+import json
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+# Fields the curated database has but a coins/list dump does not
+CATALOG_DEFAULTS = {
+    "founder": "Unknown",
+    "launch_year": "N/A",
+    "energy_use": "unknown",
+    "sustainability_score": "N/A",
+    "risk_level": "unknown",
+    "description": "Listed on CoinGecko but not yet reviewed by CryptoBuddy",
+    "consensus": "Unknown",
+    "icon": "🪙"
+}
+
+CATALOG_FIELDS = ("symbol", "name", "coingecko_id", *CATALOG_DEFAULTS)
+
+class CoinRecord(Mapping):
+    """Read-only view of one catalog row, shaped like a CRYPTO_DATABASE entry
+    
+    Records are created on lookup and hold only the catalog and a row
+    number, so the catalog itself never keeps a per-coin object around.
+    """
+    
+    __slots__ = ("_catalog", "_row")
+    
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+    
+    def __getitem__(self, field):
+        if field == "coingecko_id":
+            return self._catalog.coin_id(self._row)
+        if field == "symbol":
+            return self._catalog.symbol(self._row).upper()
+        if field == "name":
+            return self._catalog.name(self._row)
+        return CATALOG_DEFAULTS[field]
+    
+    def __iter__(self):
+        return iter(CATALOG_FIELDS)
+    
+    def __len__(self):
+        return len(CATALOG_FIELDS)
+    
+    def __repr__(self):
+        return f"CoinRecord({self['coingecko_id']!r}, {self['symbol']!r}, {self['name']!r})"
+
+def is_reviewed(crypto):
+    """Whether a coin's ratings come from the curated database rather than CATALOG_DEFAULTS"""
+    return not isinstance(crypto, CoinRecord)
+
+class CoinCatalog:
+    """Every coin from a CoinGecko coins/list dump, stored column-wise
+    
+    Ids and names are packed into one UTF-8 buffer addressed by an offset
+    array, so a coin costs a few bytes of text instead of several Python
+    objects. Symbols repeat a lot across coins, so each distinct one is
+    interned once and rows store its number. Ids and lowercased names are
+    found by bisecting arrays of their hashes and checking the candidate.
+    """
+    
+    def __init__(self, coins=()):
+        """Build the catalog from an iterable of {"id", "symbol", "name"} dicts"""
+        self.symbol_table = []
+        self._symbol_numbers = {}
+        self._symbol_rows = {}
+        
+        text = bytearray()
+        offsets = array("I", [0])
+        symbol_numbers = array("I")
+        id_hashes = []
+        name_hashes = []
+        
+        for row, coin in enumerate(coins):
+            coin_id, name = coin["id"], coin["name"]
+            text += coin_id.encode("utf-8")
+            offsets.append(len(text))
+            text += name.encode("utf-8")
+            offsets.append(len(text))
+            symbol_numbers.append(self._intern_symbol(coin["symbol"].lower(), row))
+            id_hashes.append(hash(coin_id))
+            name_hashes.append(hash(name.lower()))
+        
+        self._text = bytes(text)
+        self._offsets = offsets
+        self._symbol_numbers_by_row = symbol_numbers
+        self._id_hashes, self._id_rows = self._hash_index(id_hashes)
+        self._name_hashes, self._name_rows = self._hash_index(name_hashes)
+    
+    @classmethod
+    def load(cls, path):
+        """Load a coins/list JSON dump from disk"""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+    
+    def _intern_symbol(self, symbol, row):
+        """Get the number of a symbol, adding it to the table on first sight"""
+        number = self._symbol_numbers.get(symbol)
+        if number is None:
+            number = len(self.symbol_table)
+            symbol = sys.intern(symbol)
+            self.symbol_table.append(symbol)
+            self._symbol_numbers[symbol] = number
+            self._symbol_rows[symbol] = row
+        return number
+    
+    @staticmethod
+    def _hash_index(hashes):
+        """Sort rows by hash; the sort is stable, so equal hashes stay in listing order"""
+        rows = sorted(range(len(hashes)), key=hashes.__getitem__)
+        return array("q", [hashes[row] for row in rows]), array("I", rows)
+    
+    def _find(self, hashes, rows, key, field):
+        """Get the first row whose field(row) equals key, or None"""
+        key_hash = hash(key)
+        position = bisect_left(hashes, key_hash)
+        while position < len(hashes) and hashes[position] == key_hash:
+            row = rows[position]
+            if field(row) == key:
+                return row
+            position += 1
+        return None
+    
+    def coin_id(self, row):
+        """Get the CoinGecko id stored in a row"""
+        return self._text[self._offsets[2 * row]:self._offsets[2 * row + 1]].decode("utf-8")
+    
+    def symbol(self, row):
+        """Get the lowercase ticker symbol stored in a row"""
+        return self.symbol_table[self._symbol_numbers_by_row[row]]
+    
+    def name(self, row):
+        """Get the display name stored in a row"""
+        return self._text[self._offsets[2 * row + 1]:self._offsets[2 * row + 2]].decode("utf-8")
+    
+    def _record(self, row):
+        """Wrap a row number in a record, passing None through"""
+        return None if row is None else CoinRecord(self, row)
+    
+    def find_id(self, coin_id):
+        """Get the first listed coin with a CoinGecko id, or None"""
+        return self._record(self._find(self._id_hashes, self._id_rows, coin_id, self.coin_id))
+    
+    def find_symbol(self, symbol):
+        """Get the first listed coin with a ticker symbol (case-insensitive), or None"""
+        return self._record(self._symbol_rows.get(symbol.lower()))
+    
+    def find_name(self, name):
+        """Get the first listed coin with a name or id (case-insensitive), or None"""
+        name = name.lower()
+        row = self._find(self._name_hashes, self._name_rows, name, lambda row: self.name(row).lower())
+        if row is None:
+            row = self._find(self._id_hashes, self._id_rows, name, self.coin_id)
+        return self._record(row)
+    
+    def __len__(self):
+        return len(self._offsets) // 2
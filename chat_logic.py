@@ -3,25 +3,97 @@ CryptoBuddy Pro - Chat Logic
 Main chat processing and response generation
 """
 
+import asyncio
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from colorama import Fore, Style
-from tabulate import tabulate
-from api_utils import CoinGeckoAPI
+from api_utils import CoinGeckoAPI, AsyncCoinGeckoAPI
+from cache_utils import TTLCache
 from nlp_utils import NLPProcessor
+from table_utils import GridTable
 from crypto_data import (
     CRYPTO_DATABASE, get_crypto_by_name, get_crypto_by_symbol,
     get_sustainable_cryptos, get_low_risk_cryptos, get_low_energy_cryptos,
-    get_all_cryptos
+    get_all_cryptos, is_reviewed
 )
 
+# Shown in place of ratings a catalog coin has not been given yet
+NOT_RATED = "Not rated"
+
+class QueryAnalysis:
+    """NLP results for one query, each stage run on first use and then reused
+    
+    Read it like the dict it replaces (analysis['cryptos']); stages no
+    handler asks for are never run.
+    """
+    
+    __slots__ = ('bot', 'user_input', 'results')
+    
+    def __init__(self, bot, user_input):
+        self.bot = bot
+        self.user_input = user_input
+        self.results = {}
+    
+    def __getitem__(self, stage):
+        try:
+            return self.results[stage]
+        except KeyError:
+            value = self.results[stage] = self.bot._run_stage(stage, self.user_input)
+            return value
+
 class CryptoChatBot:
-    """Main chatbot class for CryptoBuddy Pro"""
+    """Main chatbot class for CryptoBuddy Pro
+    
+    A bot keeps no per-query state, so one instance (and its API client,
+    cache and NLP engine) can answer queries from many threads at once.
+    """
+    
+    # Intents with a dedicated handler, in order of precedence
+    HANDLED_INTENTS = ['price_query', 'comparison', 'trending', 'sustainable', 'low_risk', 'top_coins', 'advice']
+    
+    # NLP method and timing span behind each analysis stage
+    ANALYSIS_STAGES = {
+        'sentiment': ('analyze_sentiment', 'nlp.sentiment'),
+        'intents': ('detect_intent', 'nlp.intent'),
+        'cryptos': ('extract_cryptocurrencies', 'nlp.entities'),
+        'numbers': ('extract_numbers', 'nlp.numbers')
+    }
+    
+    # Intents whose answer carries a market sentiment line
+    SENTIMENT_INTENTS = ['advice', 'comparison', 'sustainable', 'low_risk']
+    
+    # Handlers whose output depends on the coins mentioned
+    CRYPTO_INTENTS = {'price_query', 'comparison', 'advice'}
+    
+    # The API data each handler's output depends on
+    INTENT_DATA = {
+        'price_query': 'price', 'comparison': 'price', 'sustainable': 'price', 'low_risk': 'price',
+        'advice': 'price', 'trending': 'trending', 'top_coins': 'top_coins'
+    }
+    
+    # Table layouts of the handlers that answer with a grid
+    COMPARISON_TABLE = GridTable(["Cryptocurrency", "Symbol", "Price", "24h Change", "Energy Use", "Sustainability", "Risk Level"])
+    SUSTAINABLE_TABLE = GridTable(["Cryptocurrency", "Symbol", "Price", "Energy Use", "Sustainability", "Consensus"])
+    LOW_RISK_TABLE = GridTable(["Cryptocurrency", "Symbol", "Price", "Market Cap", "Risk Level", "Est. Year"], int_columns=[5])
+    TOP_COINS_TABLE = GridTable(["Rank", "Name", "Symbol", "Price", "24h Change", "Market Cap"], int_columns=[0])
     
-    def __init__(self):
-        """Initialize the chatbot with API and NLP components"""
-        self.api = CoinGeckoAPI()
+    # Most coins process_queries asks simple/price for in one request
+    PREFETCH_CHUNK_SIZE = 100
+    
+    def __init__(self, api=None, response_ttl=30, max_cached_responses=512):
+        """Initialize the chatbot with API and NLP components
+        
+        Rendered answers are reused for up to response_ttl seconds (capped
+        at the TTL of the data behind them) or until that data is refetched.
+        """
+        self.api = api or CoinGeckoAPI()
+        self.async_api = AsyncCoinGeckoAPI(self.api)
         self.nlp = NLPProcessor()
+        # Stage timings live next to the API's so one registry covers a whole query
+        self.metrics = self.api.metrics
         self.disclaimer = f"\n{Fore.RED}⚠️  Remember: Cryptocurrency investments are highly risky. Always do your own research!{Style.RESET_ALL}"
                 # Friendly responses for various scenarios
         self.friendly_responses = {
@@ -41,65 +113,400 @@ class CryptoChatBot:
                 "I don't have information on that particular cryptocurrency."
             ]
         }
+        
+        # Randomly picked replies are never cached so they keep varying
+        self._friendly_texts = {text for texts in self.friendly_responses.values() for text in texts}
+        response_ttls = {endpoint: min(ttl, response_ttl) for endpoint, ttl in self.api.cache.ttls.items()}
+        self.response_cache = TTLCache(default_ttl=response_ttl, ttls=response_ttls, max_entries=max_cached_responses)
+        
+        # How many queries were analyzed and how often each stage actually ran
+        self._analyzed = 0
+        self._stage_runs = dict.fromkeys(self.ANALYSIS_STAGES, 0)
+        self._stage_lock = threading.Lock()
+    
+    def start_background_refresh(self):
+        """Keep prices, trending and top coins fresh in the background"""
+        hot_coin_ids = [crypto['coingecko_id'] for crypto in CRYPTO_DATABASE.values()]
+        self.api.start_background_refresh(hot_coin_ids=hot_coin_ids)
+    
+    def stop_background_refresh(self):
+        """Stop background cache refreshing"""
+        self.api.stop_background_refresh()
     
     def process_query(self, user_input):
         """Process user query and generate appropriate response"""
-        try:
-            # Analyze sentiment
-            sentiment = self.nlp.analyze_sentiment(user_input)
+        with self.metrics.span("query"):
+            try:
+                analysis = self._analyze(user_input)
+                return self._respond(user_input, analysis)
             
-            # Detect intents
-            intents = self.nlp.detect_intent(user_input)
-            
-            # Extract cryptocurrencies mentioned
-            mentioned_cryptos = self.nlp.extract_cryptocurrencies(user_input)
-            
-            # Extract numbers (for top N queries)
-            numbers = self.nlp.extract_numbers(user_input)
-            
-            # Process based on detected intents
-            response = ""
+            except Exception as e:
+                return f"I encountered an error processing your request: {e}{self.disclaimer}"
+    
+    def stream_query(self, user_input):
+        """Yield the response to a query piece by piece as each part is ready
+        
+        The pieces join up to exactly what process_query returns. Headers
+        come out before any fetch, coins whose prices are cached come out
+        straight away and the rest follow one batched fetch; tables come
+        out whole once their data is in.
+        """
+        yield from self.metrics.timed_chunks("query", self._stream_chunks(user_input))
+    
+    def _stream_chunks(self, user_input):
+        """Analyze a query and yield its response, or the error it ran into"""
+        try:
+            analysis = self._analyze(user_input)
+            yield from self._respond_chunks(user_input, analysis)
+        
+        except Exception as e:
+            yield f"I encountered an error processing your request: {e}{self.disclaimer}"
+    
+    async def astream_query(self, user_input):
+        """Stream the response to a query without blocking the event loop
+        
+        Each piece of stream_query is produced in the default executor, so
+        the fetch behind a piece never stalls other tasks.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = self.stream_query(user_input)
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    
+    async def aprocess_query(self, user_input):
+        """Process user query without blocking the event loop
+        
+        Everything the chosen handler needs is fetched concurrently first;
+        the response is then rendered from cache without any further I/O.
+        """
+        with self.metrics.span("query"):
+            try:
+                analysis = self._analyze(user_input)
+                await self._aprefetch(self._data_requirements(analysis))
+                
+                with self.api.cache_only():
+                    return self._respond(user_input, analysis)
             
-            if 'price_query' in intents:
-                response = self._handle_price_query(mentioned_cryptos)
-            elif 'comparison' in intents:
-                response = self._handle_comparison(mentioned_cryptos)
-            elif 'trending' in intents:
-                response = self._handle_trending_query()
-            elif 'sustainable' in intents:
-                response = self._handle_sustainable_query()
-            elif 'low_risk' in intents:
-                response = self._handle_low_risk_query()
-            elif 'top_coins' in intents:
-                limit = numbers[0] if numbers else 5
-                response = self._handle_top_coins_query(limit)
-            elif 'advice' in intents:
-                response = self._handle_advice_query(mentioned_cryptos, sentiment)
+            except Exception as e:
+                return f"I encountered an error processing your request: {e}{self.disclaimer}"
+    
+    def process_queries(self, user_inputs, max_workers=1):
+        """Answer a batch of queries with one round of API calls
+        
+        Each distinct query is analyzed once, the prices the whole batch
+        needs are fetched in batched requests of at most PREFETCH_CHUNK_SIZE
+        coins (plus trending and top coins at most once each), and the
+        responses are then rendered from cache. Analysis and rendering are
+        CPU-bound and stay on the calling thread; max_workers only bounds how
+        many prefetch requests are sent at once. A query that fails only gets
+        its own error message.
+        """
+        user_inputs = list(user_inputs)
+        
+        # Working out the data a query needs runs the NLP stages routing depends on
+        analyzed = {}
+        for user_input in user_inputs:
+            if user_input not in analyzed:
+                try:
+                    analysis = self._analyze(user_input)
+                    analyzed[user_input] = (analysis, self._data_requirements(analysis), None)
+                except Exception as e:
+                    analyzed[user_input] = (None, None, e)
+        self._prefetch_batch([requirements for _, requirements, error in analyzed.values() if error is None],
+                             max_workers)
+        
+        # Data-backed answers only depend on the query and the prefetched data, so each renders once;
+        # general queries render every time to keep their random replies varied
+        rendered = {}
+        responses = []
+        with self.api.cache_only():
+            for user_input in user_inputs:
+                response = rendered.get(user_input)
+                analysis, _, error = analyzed[user_input]
+                if response is None and error is None:
+                    try:
+                        response = self._respond(user_input, analysis)
+                        if self._primary_intent(analysis['intents']) in self.INTENT_DATA:
+                            rendered[user_input] = response
+                    except Exception as e:
+                        error = e
+                if response is None:
+                    response = f"I encountered an error processing your request: {error}{self.disclaimer}"
+                responses.append(response)
+        return responses
+    
+    def _prefetch_batch(self, batch_requirements, max_workers=1):
+        """Fetch the union of the data a batch of queries needs, given each one's _data_requirements"""
+        coin_ids = {}
+        trending = False
+        top_limits = set()
+        for requirements in batch_requirements:
+            coin_ids.update(dict.fromkeys(requirements['coin_ids']))
+            trending = trending or requirements['trending']
+            if requirements['top_limit']:
+                top_limits.add(requirements['top_limit'])
+        
+        # Chunked so a batch over a large catalog never builds one unbounded simple/price URL
+        coin_ids = list(coin_ids)
+        fetches = [lambda chunk=coin_ids[i:i + self.PREFETCH_CHUNK_SIZE]: self.api.get_coin_prices(chunk)
+                   for i in range(0, len(coin_ids), self.PREFETCH_CHUNK_SIZE)]
+        if trending:
+            fetches.append(self.api.get_trending_coins)
+        for limit in sorted(top_limits):
+            fetches.append(lambda limit=limit: self.api.get_top_coins(limit=limit))
+        
+        try:
+            if max_workers > 1 and len(fetches) > 1:
+                with ThreadPoolExecutor(max_workers=min(max_workers, len(fetches))) as pool:
+                    for future in [pool.submit(fetch) for fetch in fetches]:
+                        future.result()
             else:
-                response = self._handle_general_query(user_input, mentioned_cryptos)
-            
-            # Add sentiment-based confidence if it's investment-related
-            if any(intent in intents for intent in ['advice', 'comparison', 'sustainable', 'low_risk']):
-                confidence = self.nlp.get_confidence_level(sentiment)
-                response += f"\n\n💡 Market Sentiment: {confidence}"
-            
-            return response + self.disclaimer
-            
+                for fetch in fetches:
+                    fetch()
         except Exception as e:
-            return f"I encountered an error processing your request: {e}{self.disclaimer}"
+            # Rendering still answers from whatever is cached
+            print(f"{Fore.YELLOW}⚠️  Batch prefetch failed: {e}{Style.RESET_ALL}")
     
-    def _handle_price_query(self, cryptos):
-        """Handle price-related queries"""
-        if not cryptos:
-            return "Please specify which cryptocurrency you'd like to know the price of!"
+    def _analyze(self, user_input):
+        """Start analyzing a query; each NLP stage runs when first read"""
+        with self._stage_lock:
+            self._analyzed += 1
+        return QueryAnalysis(self, user_input)
+    
+    def _run_stage(self, stage, user_input):
+        """Run one NLP stage over a query, timing and counting it"""
+        method, span = self.ANALYSIS_STAGES[stage]
+        with self.metrics.span(span):
+            value = getattr(self.nlp, method)(user_input)
+        with self._stage_lock:
+            self._stage_runs[stage] += 1
+        return value
+    
+    def get_stage_counts(self):
+        """Get how often each analysis stage ran and was skipped"""
+        with self._stage_lock:
+            analyzed = self._analyzed
+            runs = dict(self._stage_runs)
+        return {
+            'queries': analyzed,
+            'stages': {stage: {'run': count, 'skipped': max(analyzed - count, 0)} for stage, count in runs.items()}
+        }
+    
+    def _primary_intent(self, intents):
+        """Pick the intent whose handler answers the query"""
+        for intent in self.HANDLED_INTENTS:
+            if intent in intents:
+                return intent
+        return 'general_query'
+    
+    def _top_coins_limit(self, numbers):
+        """How many coins a top-N query asks for"""
+        return numbers[0] if numbers else 5
+    
+    def _respond(self, user_input, analysis):
+        """Generate the response for an analyzed query"""
+        return "".join(self._respond_chunks(user_input, analysis))
+    
+    def _respond_chunks(self, user_input, analysis):
+        """Generate the response for an analyzed query piece by piece"""
+        intents = analysis['intents']
         
-        responses = []
+        # Process based on detected intents
+        intent = self._primary_intent(intents)
+        
+        with self.metrics.span("response_cache.lookup"):
+            cache_key = self._response_key(intent, analysis)
+            response = self.response_cache.get(cache_key) if cache_key else None
+        if response is not None:
+            yield response
+        else:
+            parts = []
+            # Handlers clear 'complete' when they answer without some of their data and set 'stale' when they label old data
+            outcome = {'complete': True, 'stale': False}
+            errors_before = self.api.request_errors
+            # Includes the handler's fetches, which are also timed on their own as api.*
+            chunks = self._render_chunks(intent, user_input, analysis, outcome)
+            for part in self.metrics.timed_chunks(f"render.{intent}", chunks):
+                parts.append(part)
+                yield part
+            response = "".join(parts)
+            # Never cache an answer made without data, or the next query would not even retry the fetch
+            cacheable = outcome['complete'] and self.api.request_errors == errors_before
+            # Data that expired mid-render leaves an unlabelled answer that must not be reused as a stale one
+            cacheable = cacheable and cache_key is not None and outcome['stale'] == cache_key[-1]
+            if cache_key and cacheable and response not in self._friendly_texts:
+                self.response_cache.set(cache_key, response)
+        
+        # Add sentiment-based confidence if it's investment-related
+        if any(intent in intents for intent in self.SENTIMENT_INTENTS):
+            confidence = self.nlp.get_confidence_level(analysis['sentiment'])
+            yield f"\n\n💡 Market Sentiment: {confidence}"
+        
+        yield self.disclaimer
+    
+    def _response_key(self, intent, analysis):
+        """Cache key for a handler's output, or None if it should not be cached
+        
+        The key holds everything the output depends on: the intent, the
+        canonical coins in order of mention (for handlers that read them),
+        numeric arguments, when each API cache entry it is rendered from
+        was fetched (so refetching other coins leaves it valid) and whether
+        any of them had expired. The
+        stamps are read before rendering, so a refresh that lands
+        mid-render only costs one extra render instead of mislabelling old
+        data as new. Until all that data is cached there is no key.
+        """
+        endpoint = self.INTENT_DATA.get(intent)
+        if endpoint is None:
+            # General queries mostly answer with a random friendly reply
+            return None
+        
+        requirements = self._data_requirements(analysis)
+        data_keys = [("price", coin_id, "usd") for coin_id in requirements['coin_ids']]
+        if requirements['trending']:
+            data_keys.append(("trending",))
+        if requirements['top_limit']:
+            data_keys.append(("top_coins", requirements['top_limit'], "usd"))
+        fetched = tuple(self.api.cache.fetched_at(key) for key in data_keys)
+        if None in fetched:
+            return None
+        
+        # Answers made from expired data carry stale labels, so they never stand in for fresh ones
+        now = time.time()
+        stale = any(fetched_at + self.api.cache.ttl_for(key) <= now for key, fetched_at in zip(data_keys, fetched))
+        
+        cryptos = tuple(analysis['cryptos']) if intent in self.CRYPTO_INTENTS else ()
+        args = (self._top_coins_limit(analysis['numbers']),) if intent == 'top_coins' else ()
+        return (endpoint, intent, cryptos, args, fetched, stale)
+    
+    def _render_chunks(self, intent, user_input, analysis, outcome=None):
+        """Run the handler for an intent, yielding its output as data arrives
+        
+        Handlers set outcome['complete'] to False when some of the API
+        data they needed was missing, and outcome['stale'] to True when
+        they labelled data served past its TTL.
+        """
+        outcome = {} if outcome is None else outcome
+        if intent == 'price_query':
+            yield from self._stream_price_query(analysis['cryptos'], outcome)
+        elif intent == 'comparison':
+            yield from self._stream_comparison(analysis['cryptos'], outcome)
+        elif intent == 'trending':
+            yield self._handle_trending_query(outcome)
+        elif intent == 'sustainable':
+            yield from self._stream_sustainable_query(outcome)
+        elif intent == 'low_risk':
+            yield from self._stream_low_risk_query(outcome)
+        elif intent == 'top_coins':
+            yield self._handle_top_coins_query(self._top_coins_limit(analysis['numbers']), outcome)
+        elif intent == 'advice':
+            yield from self._stream_advice_query(analysis['cryptos'], analysis['sentiment'], outcome)
+        else:
+            yield self._handle_general_query(user_input, analysis['cryptos'])
+    
+    def _data_requirements(self, analysis):
+        """Work out which API data the handler for a query will read"""
+        intent = self._primary_intent(analysis['intents'])
+        requirements = {'coin_ids': [], 'trending': False, 'top_limit': None}
+        
+        cryptos = analysis['cryptos'] if intent in self.CRYPTO_INTENTS else []
+        if intent in ('price_query', 'advice') or (intent == 'comparison' and len(cryptos) >= 2):
+            mentioned = cryptos[:3] if intent == 'comparison' else cryptos
+            coins = [crypto_data for _, crypto_data in self._resolve_cryptos(mentioned) if crypto_data]
+        elif intent == 'sustainable':
+            coins = get_sustainable_cryptos(min_score=7)
+        elif intent == 'low_risk':
+            coins = get_low_risk_cryptos()
+        else:
+            coins = []
+        
+        requirements['coin_ids'] = [crypto['coingecko_id'] for crypto in coins]
+        requirements['trending'] = intent == 'trending'
+        if intent == 'top_coins':
+            requirements['top_limit'] = min(self._top_coins_limit(analysis['numbers']), 20)
+        return requirements
+    
+    async def _aprefetch(self, requirements):
+        """Fetch all data a query needs concurrently"""
+        fetches = []
+        if requirements['coin_ids']:
+            fetches.append(self.async_api.get_coin_prices(requirements['coin_ids']))
+        if requirements['trending']:
+            fetches.append(self.async_api.get_trending_coins())
+        if requirements['top_limit']:
+            fetches.append(self.async_api.get_top_coins(limit=requirements['top_limit']))
+        
+        if fetches:
+            await asyncio.gather(*fetches)
+    
+    def _resolve_cryptos(self, cryptos):
+        """Look up mentioned cryptocurrencies in the local database"""
+        resolved = []
         for crypto_name in cryptos:
             normalized_name = self.nlp.normalize_crypto_name(crypto_name)
-            crypto_data = get_crypto_by_name(normalized_name)
-            
+            resolved.append((crypto_name, get_crypto_by_name(normalized_name)))
+        return resolved
+    
+    def _fetch_prices(self, cryptos, stale):
+        """Fetch prices for several database entries in one batched API call
+        
+        Coins whose price was served past its TTL are added to stale,
+        mapped to when that price was fetched.
+        """
+        coin_ids = [crypto['coingecko_id'] for crypto in cryptos if crypto]
+        if not coin_ids:
+            return {}
+        with self.api.track_stale() as stale_reads:
+            prices = self.api.get_coin_prices(coin_ids)
+        stale.update((key[1], fetched_at) for key, fetched_at in stale_reads.items() if key[0] == "price")
+        return prices
+    
+    def _with_prices(self, resolved, stale):
+        """Pair resolved coins with their price data, in order, as it becomes available
+        
+        Cached prices are used straight away; the first coin without one
+        triggers a single batched fetch for it and every coin after it.
+        Stale prices are noted in stale as _fetch_prices does.
+        """
+        with self.api.track_stale() as stale_reads:
+            prices = self.api.get_cached_prices([crypto_data['coingecko_id'] for _, crypto_data in resolved if crypto_data])
+        stale.update((key[1], fetched_at) for key, fetched_at in stale_reads.items() if key[0] == "price")
+        fetched = False
+        for index, (crypto_name, crypto_data) in enumerate(resolved):
+            if crypto_data and not fetched and crypto_data['coingecko_id'] not in prices:
+                prices.update(self._fetch_prices((crypto_data for _, crypto_data in resolved[index:]), stale))
+                fetched = True
+            yield crypto_name, crypto_data, prices.get(crypto_data['coingecko_id']) if crypto_data else None
+    
+    def _stale_note(self, fetched_at, what):
+        """Line telling the user some data was served past its TTL"""
+        updated = datetime.fromtimestamp(fetched_at).strftime('%H:%M:%S')
+        return f"🕒 Stale {what}: last updated {updated}, live data is unavailable right now\n"
+    
+    def _table_price(self, price_data, crypto, stale):
+        """Format a table's price cell, marked * if the price is stale"""
+        price = self.api.format_price(price_data.get('usd') if price_data else None)
+        return f"{price}*" if price_data and crypto['coingecko_id'] in stale else price
+    
+    def _stale_footnote(self, stale, outcome):
+        """Footnote for the table prices _table_price marked stale"""
+        if not stale:
+            return ""
+        outcome['stale'] = True
+        return f"\n{self._stale_note(min(stale.values()), 'prices marked *').rstrip()}"
+    
+    def _stream_price_query(self, cryptos, outcome):
+        """Handle price-related queries, one coin at a time"""
+        if not cryptos:
+            yield "Please specify which cryptocurrency you'd like to know the price of!"
+            return
+        
+        stale = {}
+        for index, (crypto_name, crypto_data, price_data) in enumerate(self._with_prices(self._resolve_cryptos(cryptos), stale)):
             if crypto_data:
-                price_data = self.api.get_coin_price(crypto_data['coingecko_id'])
                 if price_data:
                     price = self.api.format_price(price_data.get('usd'))
                     change = self.api.format_change(price_data.get('usd_24h_change'))
@@ -110,59 +517,80 @@ class CryptoChatBot:
 💰 Current Price: {price}
 📈 24h Change: {change}
 🏆 Market Cap: {market_cap}
-📅 Founded: {crypto_data['launch_year']} by {crypto_data['founder']}
 """
-                    responses.append(response)
+                    if crypto_data['coingecko_id'] in stale:
+                        outcome['stale'] = True
+                        response += self._stale_note(stale[crypto_data['coingecko_id']], "price")
+                    if is_reviewed(crypto_data):
+                        response += f"📅 Founded: {crypto_data['launch_year']} by {crypto_data['founder']}\n"
                 else:
-                    responses.append(f"❌ Sorry, I couldn't fetch current price data for {crypto_data['name']}.")
+                    outcome['complete'] = False
+                    response = f"❌ Sorry, I couldn't fetch current price data for {crypto_data['name']}."
             else:
-                responses.append(f"❌ I don't have information about '{crypto_name}' in my database.")
-        
-        return "\n".join(responses) if responses else random.choice(self.friendly_responses['no_data'])
+                response = f"❌ I don't have information about '{crypto_name}' in my database."
+            
+            yield response if index == 0 else "\n" + response
     
-    def _handle_comparison(self, cryptos):
+    def _stream_comparison(self, cryptos, outcome):
         """Handle cryptocurrency comparison queries"""
         if len(cryptos) < 2:
-            return "Please specify at least two cryptocurrencies to compare!"
+            yield "Please specify at least two cryptocurrencies to compare!"
+            return
         
         comparison_data = []
         valid_cryptos = []
+        stale = {}
         
-        for crypto_name in cryptos[:3]:  # Limit to 3 for readability
-            normalized_name = self.nlp.normalize_crypto_name(crypto_name)
-            crypto_data = get_crypto_by_name(normalized_name)
-            
+        resolved = self._resolve_cryptos(cryptos[:3])  # Limit to 3 for readability
+        if not any(crypto_data for _, crypto_data in resolved):
+            yield "I couldn't find data for the cryptocurrencies you mentioned."
+            return
+        
+        yield "📊 **Cryptocurrency Comparison**\n"
+        prices = self._fetch_prices((crypto_data for _, crypto_data in resolved), stale)
+        
+        for crypto_name, crypto_data in resolved:
             if crypto_data:
-                price_data = self.api.get_coin_price(crypto_data['coingecko_id'])
+                price_data = prices.get(crypto_data['coingecko_id'])
+                if not price_data:
+                    outcome['complete'] = False
+                
+                if is_reviewed(crypto_data):
+                    ratings = [
+                        crypto_data['energy_use'].title(),
+                        f"{crypto_data['sustainability_score']}/10",
+                        crypto_data['risk_level'].title()
+                    ]
+                else:
+                    ratings = [NOT_RATED] * 3
                 
                 row = [
                     f"{crypto_data['icon']} {crypto_data['name']}",
                     crypto_data['symbol'],
-                    self.api.format_price(price_data.get('usd') if price_data else None),
+                    self._table_price(price_data, crypto_data, stale),
                     self.api.format_change(price_data.get('usd_24h_change') if price_data else None),
-                    crypto_data['energy_use'].title(),
-                    f"{crypto_data['sustainability_score']}/10",
-                    crypto_data['risk_level'].title()
+                    *ratings
                 ]
                 comparison_data.append(row)
                 valid_cryptos.append(crypto_data)
         
-        if not comparison_data:
-            return "I couldn't find data for the cryptocurrencies you mentioned."
-        
-        headers = ["Cryptocurrency", "Symbol", "Price", "24h Change", "Energy Use", "Sustainability", "Risk Level"]
-        table = tabulate(comparison_data, headers=headers, tablefmt="grid")
+        table = self.COMPARISON_TABLE.render(comparison_data)
         
-        return f"📊 **Cryptocurrency Comparison**\n```\n{table}\n```"
+        yield f"```\n{table}\n```{self._stale_footnote(stale, outcome)}"
     
-    def _handle_trending_query(self):
+    def _handle_trending_query(self, outcome):
         """Handle trending cryptocurrency queries"""
-        trending = self.api.get_trending_coins()
+        with self.api.track_stale() as stale:
+            trending = self.api.get_trending_coins()
         
         if not trending:
+            outcome['complete'] = False
             return "❌ I couldn't fetch trending data right now. Please try again later."
         
         response = "🔥 **Trending Cryptocurrencies Right Now:**\n\n"
+        if stale:
+            outcome['stale'] = True
+            response += self._stale_note(min(stale.values()), "trending list") + "\n"
         
         for i, coin in enumerate(trending[:7], 1):
             coin_data = coin.get('item', {})
@@ -175,19 +603,25 @@ class CryptoChatBot:
         
         return response
     
-    def _handle_sustainable_query(self):
+    def _stream_sustainable_query(self, outcome):
         """Handle sustainability-related queries"""
         sustainable_cryptos = get_sustainable_cryptos(min_score=7)
         
         if not sustainable_cryptos:
-            return "I don't have any cryptocurrencies with high sustainability scores in my database."
+            yield "I don't have any cryptocurrencies with high sustainability scores in my database."
+            return
         
-        response = "🌱 **Most Sustainable Cryptocurrency Options:**\n\n"
+        yield "🌱 **Most Sustainable Cryptocurrency Options:**\n\n"
+        
+        stale = {}
+        prices = self._fetch_prices(sustainable_cryptos, stale)
         
         sustainable_data = []
         for crypto in sustainable_cryptos:
-            price_data = self.api.get_coin_price(crypto['coingecko_id'])
-            price = self.api.format_price(price_data.get('usd') if price_data else None)
+            price_data = prices.get(crypto['coingecko_id'])
+            if not price_data:
+                outcome['complete'] = False
+            price = self._table_price(price_data, crypto, stale)
             
             row = [
                 f"{crypto['icon']} {crypto['name']}",
@@ -199,24 +633,29 @@ class CryptoChatBot:
             ]
             sustainable_data.append(row)
         
-        headers = ["Cryptocurrency", "Symbol", "Price", "Energy Use", "Sustainability", "Consensus"]
-        table = tabulate(sustainable_data, headers=headers, tablefmt="grid")
+        table = self.SUSTAINABLE_TABLE.render(sustainable_data)
         
-        return f"{response}```\n{table}\n```\n\n💡 These cryptocurrencies use energy-efficient consensus mechanisms!"
+        yield f"```\n{table}\n```{self._stale_footnote(stale, outcome)}\n\n💡 These cryptocurrencies use energy-efficient consensus mechanisms!"
     
-    def _handle_low_risk_query(self):
+    def _stream_low_risk_query(self, outcome):
         """Handle low-risk investment queries"""
         low_risk_cryptos = get_low_risk_cryptos()
         
         if not low_risk_cryptos:
-            return "Based on my analysis, I don't have any cryptocurrencies classified as low-risk. Remember, all crypto investments carry significant risk!"
+            yield "Based on my analysis, I don't have any cryptocurrencies classified as low-risk. Remember, all crypto investments carry significant risk!"
+            return
+        
+        yield "🛡️ **Lower Risk Cryptocurrency Options:**\n\n"
         
-        response = "🛡️ **Lower Risk Cryptocurrency Options:**\n\n"
+        stale = {}
+        prices = self._fetch_prices(low_risk_cryptos, stale)
         
         risk_data = []
         for crypto in low_risk_cryptos:
-            price_data = self.api.get_coin_price(crypto['coingecko_id'])
-            price = self.api.format_price(price_data.get('usd') if price_data else None)
+            price_data = prices.get(crypto['coingecko_id'])
+            if not price_data:
+                outcome['complete'] = False
+            price = self._table_price(price_data, crypto, stale)
             market_cap = self.api.format_market_cap(price_data.get('usd_market_cap') if price_data else None)
             
             row = [
@@ -229,19 +668,23 @@ class CryptoChatBot:
             ]
             risk_data.append(row)
         
-        headers = ["Cryptocurrency", "Symbol", "Price", "Market Cap", "Risk Level", "Est. Year"]
-        table = tabulate(risk_data, headers=headers, tablefmt="grid")
+        table = self.LOW_RISK_TABLE.render(risk_data)
         
-        return f"{response}```\n{table}\n```\n\n⚠️ Even 'low-risk' crypto investments can be volatile!"
+        yield f"```\n{table}\n```{self._stale_footnote(stale, outcome)}\n\n⚠️ Even 'low-risk' crypto investments can be volatile!"
     
-    def _handle_top_coins_query(self, limit=5):
+    def _handle_top_coins_query(self, limit, outcome):
         """Handle top cryptocurrencies queries"""
-        top_coins = self.api.get_top_coins(limit=min(limit, 20))
+        with self.api.track_stale() as stale:
+            top_coins = self.api.get_top_coins(limit=min(limit, 20))
         
         if not top_coins:
+            outcome['complete'] = False
             return "❌ I couldn't fetch the top cryptocurrencies right now. Please try again later."
         
         response = f"🏆 **Top {len(top_coins)} Cryptocurrencies by Market Cap:**\n\n"
+        if stale:
+            outcome['stale'] = True
+            response += self._stale_note(min(stale.values()), "market data") + "\n"
         
         top_data = []
         for i, coin in enumerate(top_coins, 1):
@@ -254,30 +697,28 @@ class CryptoChatBot:
             row = [i, f"{name}", symbol, price, change, market_cap]
             top_data.append(row)
         
-        headers = ["Rank", "Name", "Symbol", "Price", "24h Change", "Market Cap"]
-        table = tabulate(top_data, headers=headers, tablefmt="grid")
+        table = self.TOP_COINS_TABLE.render(top_data)
         
         return f"{response}```\n{table}\n```"
     
-    def _handle_advice_query(self, cryptos, sentiment):
+    def _stream_advice_query(self, cryptos, sentiment, outcome):
         """Handle investment advice queries"""
-        response = "💡 **CryptoBuddy Pro Investment Insights:**\n\n"
+        yield "💡 **CryptoBuddy Pro Investment Insights:**\n\n"
         
         if cryptos:
-            # Specific crypto advice
-            for crypto_name in cryptos:
-                normalized_name = self.nlp.normalize_crypto_name(crypto_name)
-                crypto_data = get_crypto_by_name(normalized_name)
-                
+            # Specific crypto advice, one coin at a time
+            stale = {}
+            for crypto_name, crypto_data, price_data in self._with_prices(self._resolve_cryptos(cryptos), stale):
                 if crypto_data:
-                    price_data = self.api.get_coin_price(crypto_data['coingecko_id'])
-                    
-                    response += f"{crypto_data['icon']} **{crypto_data['name']} Analysis:**\n"
-                    response += f"🎯 Risk Level: {crypto_data['risk_level'].title()}\n"
-                    response += f"🌱 Sustainability Score: {crypto_data['sustainability_score']}/10\n"
-                    response += f"⚡ Energy Usage: {crypto_data['energy_use'].replace('_', ' ').title()}\n"
+                    response = f"{crypto_data['icon']} **{crypto_data['name']} Analysis:**\n"
+                    if is_reviewed(crypto_data):
+                        response += f"🎯 Risk Level: {crypto_data['risk_level'].title()}\n"
+                        response += f"🌱 Sustainability Score: {crypto_data['sustainability_score']}/10\n"
+                        response += f"⚡ Energy Usage: {crypto_data['energy_use'].replace('_', ' ').title()}\n"
                     
-                    if price_data:
+                    if not price_data:
+                        outcome['complete'] = False
+                    else:
                         change = price_data.get('usd_24h_change', 0)
                         if change > 5:
                             response += f"📈 Strong upward momentum (+{change:.2f}%)\n"
@@ -285,11 +726,15 @@ class CryptoChatBot:
                             response += f"📉 Experiencing downward pressure ({change:.2f}%)\n"
                         else:
                             response += f"📊 Relatively stable movement ({change:.2f}%)\n"
+                        if crypto_data['coingecko_id'] in stale:
+                            outcome['stale'] = True
+                            response += self._stale_note(stale[crypto_data['coingecko_id']], "price data")
                     
                     response += f"📝 {crypto_data['description']}\n\n"
+                    yield response
         else:
             # General advice
-            response += "🎯 **General Investment Principles:**\n\n"
+            response = "🎯 **General Investment Principles:**\n\n"
             response += "1. 🏦 **Diversification**: Don't put all eggs in one basket\n"
             response += "2. 📚 **Research**: Understand the technology and team\n"
             response += "3. 💰 **Risk Management**: Only invest what you can afford to lose\n"
@@ -302,8 +747,7 @@ class CryptoChatBot:
                 response += "🌿 **Sustainable Options to Consider:**\n"
                 for crypto in sustainable:
                     response += f"• {crypto['icon']} {crypto['name']} - {crypto['description']}\n"
-        
-        return response
+            yield response
     
     def _handle_general_query(self, user_input, cryptos):
         """Handle general queries and fallback responses"""
@@ -313,34 +757,76 @@ class CryptoChatBot:
         if cryptos:
             # If cryptos are mentioned, provide general info
             responses = []
-            for crypto_name in cryptos:
-                normalized_name = self.nlp.normalize_crypto_name(crypto_name)
-                crypto_data = get_crypto_by_name(normalized_name)
-                
+            for crypto_name, crypto_data in self._resolve_cryptos(cryptos):
                 if crypto_data:
                     response = f"\n{crypto_data['icon']} **{crypto_data['name']} ({crypto_data['symbol']}) Overview:**\n"
-                    response += f"📅 Founded: {crypto_data['launch_year']} by {crypto_data['founder']}\n"
+                    if is_reviewed(crypto_data):
+                        response += f"📅 Founded: {crypto_data['launch_year']} by {crypto_data['founder']}\n"
                     response += f"📝 {crypto_data['description']}\n"
-                    response += f"🔧 Consensus: {crypto_data['consensus']}\n"
-                    response += f"🌱 Sustainability: {crypto_data['sustainability_score']}/10\n"
+                    if is_reviewed(crypto_data):
+                        response += f"🔧 Consensus: {crypto_data['consensus']}\n"
+                        response += f"🌱 Sustainability: {crypto_data['sustainability_score']}/10\n"
                     responses.append(response)
             
             return "\n".join(responses) if responses else random.choice(self.friendly_responses['no_data'])
         
         return random.choice(self.friendly_responses['fallback'])
     
+    def get_status(self):
+        """Collect refresh, cache, connection and rate-limit statistics"""
+        connection_stats = self.api.get_connection_stats().values()
+        return {
+            'last_refresh': self.api.get_last_refresh_time(),
+            'database_coins': len(CRYPTO_DATABASE),
+            'cache': self.api.get_cache_stats(),
+            'responses': self.response_cache.stats(),
+            'connections': {
+                'new': sum(stats['handshakes'] for stats in connection_stats),
+                'reused': sum(stats['reused'] for stats in connection_stats)
+            },
+            'coalescing': self.api.get_coalescing_stats(),
+            'rate_limit': self.api.get_rate_limit_stats(),
+            'stages': self.api.get_stage_stats(),
+            'analysis': self.get_stage_counts()
+        }
+    
     def show_status(self):
         """Show system status and last refresh time"""
+        status_data = self.get_status()
+        cache_stats = status_data['cache']
+        response_stats = status_data['responses']
+        connections = status_data['connections']
+        rate_limit_stats = status_data['rate_limit']
+        skipped_stages = ", ".join(f"{stage} skipped {counts['skipped']}/{counts['run'] + counts['skipped']}"
+                                   for stage, counts in status_data['analysis']['stages'].items())
+        
         status = f"""
 {Fore.CYAN}📊 **CryptoBuddy Pro System Status**{Style.RESET_ALL}
 
-🕐 Last Data Refresh: {self.api.get_last_refresh_time()}
+🕐 Last Data Refresh: {status_data['last_refresh']}
 📈 API Status: {'✅ Connected' if self.api else '❌ Disconnected'}
-🧠 NLP Engine: ✅ Active
-💾 Local Database: {len(CRYPTO_DATABASE)} cryptocurrencies
-🌐 Cache Status: {'✅ Active' if self.api.cache else '❌ Empty'}
-
+🧠 NLP Engine: ✅ Active ({skipped_stages})
+💾 Local Database: {status_data['database_coins']} cryptocurrencies
+🌐 Cache Status: {'✅ Active' if self.api.cache else '❌ Empty'} ({cache_stats['entries']}/{cache_stats['max_entries']} entries)
+🎯 Cache Hits: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['evictions']} evictions
+🧾 Rendered Responses: {response_stats['entries']} cached, {response_stats['hits']} reused, {response_stats['misses']} rendered
+🔌 Connections: {connections['new']} new, {connections['reused']} reused
+🔁 Coalesced Requests: {status_data['coalescing']['coalesced']}
+🚦 Rate Limit: {rate_limit_stats['tokens']}/{rate_limit_stats['capacity']} tokens, {rate_limit_stats['rejected']} held back, {rate_limit_stats['throttled']} throttled (429)
+{self._format_stage_stats(status_data['stages'])}
 {Fore.GREEN}System is running normally!{Style.RESET_ALL}
 """
         print(status)
-	
+    
+    def _format_stage_stats(self, stages):
+        """Lines of per-stage latency for the status report"""
+        if not self.metrics.enabled:
+            return "⏱️  Stage Timings: off (start with --metrics or CRYPTOBUDDY_METRICS=1)\n"
+        if not stages:
+            return "⏱️  Stage Timings: nothing timed yet\n"
+        
+        lines = [f"⏱️  Stage Timings (ms): {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"]
+        for name, stats in stages.items():
+            lines.append(f"   {name:<21}{stats['count']:>7} {stats['p50'] * 1000:>9.3f} {stats['p95'] * 1000:>9.3f} "
+                         f"{stats['p99'] * 1000:>9.3f} {stats['max'] * 1000:>9.3f}")
+        return "\n".join(lines) + "\n"
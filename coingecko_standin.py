@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+CryptoBuddy Pro - CoinGecko Stand-in
+Local record/replay server for the CoinGecko endpoints CoinGeckoAPI uses
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import sys
+import zlib
+from http import HTTPStatus
+import requests
+from colorama import init, Fore, Style
+from api_utils import HTTPTransport
+from crypto_data import CRYPTO_DATABASE
+from server_utils import JSONServer, HTTPError
+
+def page_params(params):
+    """Get (per_page, page) for coins/markets, answering 400 unless both are positive integers"""
+    try:
+        per_page, page = int(params.get("per_page", 100)), int(params.get("page", 1))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "per_page and page must be integers")
+    if per_page < 1 or page < 1:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "per_page and page must be at least 1")
+    return per_page, page
+
+class Fixtures:
+    """Recorded CoinGecko responses, stored the way replay looks them up
+    
+    prices maps coin ids to their simple/price entry, markets holds the
+    coins/markets rows in market-cap order, trending is the last
+    search/trending response and details maps coin ids to coins/{id}.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, prices=None, markets=None, trending=None, details=None):
+        self.prices = dict(prices or {})
+        self.markets = list(markets or [])
+        self.trending = trending or {"coins": []}
+        self.details = dict(details or {})
+    
+    @classmethod
+    def load(cls, path):
+        """Read fixtures written by save()"""
+        with open(os.path.expanduser(path), encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"Unsupported fixture version {data.get('version')!r}")
+        return cls(data["prices"], data["markets"], data["trending"], data["details"])
+    
+    def save(self, path):
+        """Write the fixtures atomically, so a crash never leaves half a file"""
+        path = os.path.expanduser(path)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": self.VERSION,
+                "prices": self.prices,
+                "markets": self.markets,
+                "trending": self.trending,
+                "details": self.details
+            }, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def synthetic(cls, database=CRYPTO_DATABASE, market_size=50):
+        """Deterministic made-up data for every coin in the database
+        
+        The same database always gives the same fixtures, so runs against
+        them can be compared without recording anything first.
+        """
+        fixtures = cls()
+        coins = sorted(database.values(), key=lambda crypto: crypto["coingecko_id"])
+        for crypto in coins:
+            coin_id = crypto["coingecko_id"]
+            rng = random.Random(zlib.crc32(coin_id.encode("utf-8")))
+            price = round(10 ** rng.uniform(-2, 5), 6)
+            change = round(rng.uniform(-12, 12), 4)
+            market_cap = round(price * 10 ** rng.uniform(7, 9), 2)
+            fixtures.prices[coin_id] = {
+                "usd": price, "usd_24h_change": change,
+                "usd_market_cap": market_cap, "usd_24h_vol": round(market_cap * rng.uniform(0.01, 0.2), 2)
+            }
+            fixtures.details[coin_id] = {
+                "id": coin_id, "symbol": crypto["symbol"].lower(), "name": crypto["name"],
+                "market_data": {
+                    "current_price": {"usd": price},
+                    "market_cap": {"usd": market_cap},
+                    "price_change_percentage_24h": change
+                }
+            }
+        
+        rows = [{"id": coin_id, "symbol": fixtures.details[coin_id]["symbol"], "name": fixtures.details[coin_id]["name"],
+                 "current_price": entry["usd"], "market_cap": entry["usd_market_cap"],
+                 "price_change_percentage_24h": entry["usd_24h_change"]}
+                for coin_id, entry in fixtures.prices.items()]
+        rows += [{"id": f"standin-{i}", "symbol": f"sti{i}", "name": f"Stand-in Coin {i}",
+                  "current_price": round(1000 / i, 4), "market_cap": round(1e9 / i, 2),
+                  "price_change_percentage_24h": round((-1) ** i * i / 10, 2)}
+                 for i in range(1, max(market_size - len(rows), 0) + 1)]
+        rows.sort(key=lambda row: -row["market_cap"])
+        for rank, row in enumerate(rows, 1):
+            row["market_cap_rank"] = rank
+        fixtures.markets = rows[:market_size]
+        
+        fixtures.trending = {"coins": [
+            {"item": {"id": row["id"], "name": row["name"], "symbol": row["symbol"].upper(),
+                      "market_cap_rank": row["market_cap_rank"]}}
+            for row in rows[1:len(rows):max(len(rows) // 7, 1)][:7]
+        ]}
+        return fixtures
+    
+    def record(self, endpoint, params, data):
+        """Merge an upstream response into the fixtures"""
+        if endpoint == "simple/price":
+            self.prices.update(data)
+        elif endpoint == "search/trending":
+            self.trending = data
+        elif endpoint == "coins/markets":
+            per_page, page = page_params(params)
+            start = (page - 1) * per_page
+            if start <= len(self.markets):
+                self.markets[start:start + len(data)] = data
+        elif endpoint.startswith("coins/"):
+            self.details[endpoint.split("/", 1)[1]] = data
+    
+    def answer(self, endpoint, params):
+        """Replay a request as (status, payload), shaped like CoinGecko's answer"""
+        if endpoint == "simple/price":
+            currencies = params.get("vs_currencies", "usd").split(",")
+            return HTTPStatus.OK, {
+                coin_id: {key: value for key, value in self.prices[coin_id].items() if key.split("_")[0] in currencies}
+                for coin_id in params.get("ids", "").split(",") if coin_id in self.prices
+            }
+        if endpoint == "search/trending":
+            return HTTPStatus.OK, self.trending
+        if endpoint == "coins/markets":
+            per_page, page = page_params(params)
+            return HTTPStatus.OK, self.markets[(page - 1) * per_page:page * per_page]
+        if endpoint.startswith("coins/") and endpoint.count("/") == 1:
+            details = self.details.get(endpoint.split("/", 1)[1])
+            if details is None:
+                return HTTPStatus.NOT_FOUND, {"error": "coin not found"}
+            return HTTPStatus.OK, details
+        return HTTPStatus.NOT_FOUND, {"error": f"The stand-in does not serve {endpoint}"}
+
+class StandInServer(JSONServer):
+    """Serves CoinGecko API paths from fixtures, with injected latency and failures
+    
+    Requests are answered under /api/v3/ (so base_url can point straight
+    at the server) and, as a shorthand, at the bare endpoint path. Every
+    response waits latency ± jitter seconds; then error_rate of them get
+    a 503 and rate_limit_rate of them a 429 with Retry-After. Give seed to
+    draw the same delays and failures on every run.
+    
+    With an upstream URL the server records instead: each request is
+    forwarded unchanged, and its answer is returned and merged into
+    the fixtures.
+    
+    GET /__standin__/stats reports what has been served.
+    """
+    
+    PREFIX = "/api/v3/"
+    STATS_PATH = "/__standin__/stats"
+    
+    def __init__(self, fixtures, host="127.0.0.1", port=8090, latency=0.0, jitter=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after=1, seed=None, upstream=None, transport=None):
+        """Configure the server; nothing listens until start()"""
+        super().__init__(host, port)
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.transport = transport or (HTTPTransport() if upstream else None)
+        
+        self.served = {}
+        self.injected_errors = 0
+        self.injected_rate_limits = 0
+        self.recorded = 0
+    
+    def stats(self):
+        """Get per-endpoint request counts and injected failures"""
+        return {
+            "mode": "record" if self.upstream else "replay",
+            "requests": self.requests,
+            "served": dict(self.served),
+            "injected_errors": self.injected_errors,
+            "injected_rate_limits": self.injected_rate_limits,
+            "recorded": self.recorded
+        }
+    
+    async def _respond(self, writer, request, keep_alive):
+        """Answer one CoinGecko request"""
+        method, path, params, _, _ = request
+        if path == self.STATS_PATH:
+            await self._send(writer, HTTPStatus.OK, self.stats(), keep_alive)
+            return
+        if method != "GET":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "CoinGecko endpoints only take GET")
+        
+        endpoint = path[len(self.PREFIX):] if path.startswith(self.PREFIX) else path.lstrip("/")
+        label = "coins/{id}" if endpoint.startswith("coins/") and endpoint not in ("coins/markets", "coins/list") else endpoint
+        self.served[label] = self.served.get(label, 0) + 1
+        if endpoint == "coins/markets":
+            # Reject bad paging before forwarding upstream or injecting failures
+            page_params(params)
+        
+        if self.upstream:
+            status, payload = await self._record(endpoint, params)
+            await self._send(writer, status, payload, keep_alive)
+            return
+        
+        delay = max(self.latency + self.random.uniform(-self.jitter, self.jitter), 0.0)
+        roll = self.random.random()
+        if delay:
+            await asyncio.sleep(delay)
+        
+        if roll < self.rate_limit_rate:
+            self.injected_rate_limits += 1
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "You've exceeded the Rate Limit (stand-in)",
+                            {"Retry-After": str(self.retry_after)})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.injected_errors += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Injected failure (stand-in)")
+        
+        status, payload = self.fixtures.answer(endpoint, params)
+        await self._send(writer, status, payload, keep_alive)
+    
+    async def _record(self, endpoint, params):
+        """Forward a request upstream and keep a successful answer"""
+        url = f"{self.upstream}/{endpoint}"
+        fetch = functools.partial(self.transport.get, url, endpoint, params=params)
+        try:
+            response = await asyncio.get_running_loop().run_in_executor(None, fetch)
+        except requests.exceptions.HTTPError as e:
+            if e.response is None:
+                raise HTTPError(HTTPStatus.BAD_GATEWAY, f"Upstream failed: {e}")
+            retry_after = e.response.headers.get("Retry-After")
+            raise HTTPError(e.response.status_code, f"Upstream answered {e.response.status_code}",
+                            {"Retry-After": retry_after} if retry_after else {})
+        except requests.exceptions.RequestException as e:
+            raise HTTPError(HTTPStatus.BAD_GATEWAY, f"Upstream unreachable: {e}")
+        
+        data = response.json()
+        self.fixtures.record(endpoint, params, data)
+        self.recorded += 1
+        return HTTPStatus.OK, data
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Local stand-in for the CoinGecko API")
+    parser.add_argument("mode", choices=["replay", "record"],
+                        help="replay fixtures, or record them by forwarding to --upstream")
+    parser.add_argument("--fixtures", help="fixture file to replay from or record to "
+                                           "(replay without it serves synthetic data)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8090, help="port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random ± seconds around --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--seed", type=int, help="random seed for reproducible delays and failures")
+    parser.add_argument("--upstream", default=os.environ.get("CRYPTOBUDDY_UPSTREAM_URL", "https://api.coingecko.com/api/v3"),
+                        help="API to forward to in record mode")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run the stand-in until interrupted"""
+    args = parse_args(argv)
+    init()
+    
+    if args.mode == "record":
+        if not args.fixtures:
+            print(f"{Fore.RED}❌ record needs --fixtures to write to{Style.RESET_ALL}")
+            return 1
+        fixtures = Fixtures.load(args.fixtures) if os.path.exists(args.fixtures) else Fixtures()
+    elif args.fixtures:
+        fixtures = Fixtures.load(args.fixtures)
+    else:
+        fixtures = Fixtures.synthetic()
+    
+    server = StandInServer(fixtures, args.host, args.port, latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                           retry_after=args.retry_after, seed=args.seed,
+                           upstream=args.upstream if args.mode == "record" else None)
+    
+    async def serve():
+        host, port = await server.start()
+        source = f"recording {args.upstream}" if server.upstream else f"replaying {args.fixtures or 'synthetic data'}"
+        print(f"{Fore.GREEN}🧪 CoinGecko stand-in on http://{host}:{port}/api/v3, {source}{Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}   python main.py --api-url http://{host}:{port}/api/v3  •  Ctrl+C to stop{Style.RESET_ALL}")
+        await server.serve_forever()
+    
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.upstream:
+            fixtures.save(args.fixtures)
+            print(f"\n{Fore.CYAN}💾 Saved {server.recorded} recorded responses to {args.fixtures}{Style.RESET_ALL}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
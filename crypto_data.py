@@ -3,6 +3,9 @@ CryptoBuddy Pro - Local Cryptocurrency Database
 Contains detailed information about various cryptocurrencies
 """
 
+from bisect import bisect_left, bisect_right
+from catalog_utils import CoinCatalog, is_reviewed
+
 # Comprehensive cryptocurrency database with detailed information
 CRYPTO_DATABASE = {
     "bitcoin": {
@@ -16,7 +19,8 @@ CRYPTO_DATABASE = {
         "risk_level": "medium",
         "description": "The first and largest cryptocurrency by market cap",
         "consensus": "Proof of Work",
-        "icon": "₿"
+        "icon": "₿",
+        "aliases": ["xbt"]
     },
     "ethereum": {
         "symbol": "ETH",  
@@ -29,7 +33,8 @@ CRYPTO_DATABASE = {
         "risk_level": "medium",
         "description": "Smart contract platform and second-largest cryptocurrency",
         "consensus": "Proof of Stake",
-        "icon": "Ξ"
+        "icon": "Ξ",
+        "aliases": ["ether"]
     },
     "cardano": {
         "symbol": "ADA",
@@ -68,7 +73,8 @@ CRYPTO_DATABASE = {
         "risk_level": "medium",
         "description": "Ethereum scaling solution with low energy consumption",
         "consensus": "Proof of Stake",
-        "icon": "⬢"
+        "icon": "⬢",
+        "aliases": ["pol"]
     },
     "algorand": {
         "symbol": "ALGO",
@@ -120,7 +126,8 @@ CRYPTO_DATABASE = {
         "risk_level": "medium",
         "description": "Payment network for cross-border transactions",
         "consensus": "Stellar Consensus Protocol",
-        "icon": "✦"
+        "icon": "✦",
+        "aliases": ["lumens"]
     },
     "tezos": {
         "symbol": "XTZ",
@@ -154,50 +161,104 @@ RISK_LEVELS = {
     "very_high": 4
 }
 
+class CryptoIndex:
+    """Lookup tables over a coin database, built once when it is loaded
+    
+    Symbols, names, keys, CoinGecko ids and aliases map straight to their
+    coin, and the threshold queries read from views pre-sorted by
+    sustainability, risk and energy use so each one is a bisect and a slice.
+    """
+    
+    def __init__(self, crypto_database):
+        """Build every index for the given {key: coin} database"""
+        self.cryptos = list(crypto_database.values())
+        self.by_symbol = {}
+        self.by_name = {}
+        
+        for key, crypto in crypto_database.items():
+            self.by_symbol.setdefault(crypto["symbol"].upper(), crypto)
+            terms = [key, crypto["name"], crypto.get("coingecko_id", key), *crypto.get("aliases", ())]
+            for term in terms:
+                self.by_name.setdefault(term.lower(), crypto)
+        
+        # Sorted terms answer partial names with a prefix search
+        self.sorted_terms = sorted(self.by_name)
+        
+        # Most sustainable first; bisect needs ascending keys, so negate the score
+        self.by_sustainability = sorted(self.cryptos, key=lambda c: -c["sustainability_score"])
+        self.sustainability_keys = [-c["sustainability_score"] for c in self.by_sustainability]
+        
+        self.by_risk = sorted(self.cryptos, key=lambda c: RISK_LEVELS.get(c["risk_level"], len(RISK_LEVELS) + 1))
+        self.risk_keys = [RISK_LEVELS.get(c["risk_level"], len(RISK_LEVELS) + 1) for c in self.by_risk]
+        
+        self.by_energy = sorted(self.cryptos, key=lambda c: ENERGY_LEVELS.get(c["energy_use"], len(ENERGY_LEVELS) + 1))
+        self.energy_keys = [ENERGY_LEVELS.get(c["energy_use"], len(ENERGY_LEVELS) + 1) for c in self.by_energy]
+    
+    def find_prefix(self, prefix):
+        """Get the coin whose alphabetically first term starts with prefix, or None"""
+        position = bisect_left(self.sorted_terms, prefix)
+        if position < len(self.sorted_terms) and self.sorted_terms[position].startswith(prefix):
+            return self.by_name[self.sorted_terms[position]]
+        return None
+
+_index = CryptoIndex(CRYPTO_DATABASE)
+
+# Full CoinGecko coin list consulted after the curated database, if loaded
+_catalog = None
+
+def reindex():
+    """Rebuild the lookup indexes after CRYPTO_DATABASE has been modified"""
+    global _index
+    _index = CryptoIndex(CRYPTO_DATABASE)
+
+def load_coin_catalog(path):
+    """Load a CoinGecko coins/list dump so lookups also cover unreviewed coins"""
+    return set_coin_catalog(CoinCatalog.load(path))
+
+def set_coin_catalog(catalog):
+    """Use a CoinCatalog (or None) as the fallback for lookups"""
+    global _catalog
+    _catalog = catalog
+    return catalog
+
+def get_coin_catalog():
+    """Get the loaded CoinCatalog, or None"""
+    return _catalog
+
 def get_crypto_by_symbol(symbol):
     """Get cryptocurrency data by symbol"""
-    symbol = symbol.upper()
-    for crypto in CRYPTO_DATABASE.values():
-        if crypto["symbol"] == symbol:
-            return crypto
-    return None
+    crypto = _index.by_symbol.get(symbol.upper())
+    if crypto is None and _catalog is not None:
+        crypto = _catalog.find_symbol(symbol)
+    return crypto
 
 def get_crypto_by_name(name):
-    """Get cryptocurrency data by name (case-insensitive)"""
+    """Get cryptocurrency data by name, alias or CoinGecko id (case-insensitive)"""
     name = name.lower()
-    if name in CRYPTO_DATABASE:
-        return CRYPTO_DATABASE[name]
+    crypto = _index.by_name.get(name)
+    if crypto is None and _catalog is not None:
+        crypto = _catalog.find_name(name)
+    if crypto is not None:
+        return crypto
     
-    # Try partial matching
-    for key, crypto in CRYPTO_DATABASE.items():
-        if name in key or name in crypto["name"].lower():
-            return crypto
-    return None
+    # Try partial matching on the start of a name
+    return _index.find_prefix(name) if name else None
 
 def get_sustainable_cryptos(min_score=7):
-    """Get cryptocurrencies with high sustainability scores"""
-    sustainable = []
-    for crypto in CRYPTO_DATABASE.values():
-        if crypto["sustainability_score"] >= min_score:
-            sustainable.append(crypto)
-    return sustainable
-
-def get_low_risk_cryptos():
+    """Get cryptocurrencies with high sustainability scores, most sustainable first"""
+    end = bisect_right(_index.sustainability_keys, -min_score)
+    return _index.by_sustainability[:end]
+
+def get_low_risk_cryptos(max_level="low"):
     """Get cryptocurrencies with low risk levels"""
-    low_risk = []
-    for crypto in CRYPTO_DATABASE.values():
-        if crypto["risk_level"] == "low":
-            low_risk.append(crypto)
-    return low_risk
-
-def get_low_energy_cryptos():
-    """Get cryptocurrencies with low energy usage"""
-    low_energy = []
-    for crypto in CRYPTO_DATABASE.values():
-        if crypto["energy_use"] in ["very_low", "low"]:
-            low_energy.append(crypto)
-    return low_energy
+    end = bisect_right(_index.risk_keys, RISK_LEVELS[max_level])
+    return _index.by_risk[:end]
+
+def get_low_energy_cryptos(max_level="low"):
+    """Get cryptocurrencies with low energy usage, lowest first"""
+    end = bisect_right(_index.energy_keys, ENERGY_LEVELS[max_level])
+    return _index.by_energy[:end]
 
 def get_all_cryptos():
     """Get all cryptocurrencies in the database"""
-    return list(CRYPTO_DATABASE.values())
\ No newline at end of file
+    return list(_index.cryptos)
@@ -4,11 +4,18 @@ CryptoBuddy Pro - Advanced CLI Cryptocurrency Advisor Chatbot
 Main application entry point
 """
 
+import argparse
 import sys
 import os
 from datetime import datetime
 from colorama import init, Fore, Style
+from api_utils import CoinGeckoAPI
 from chat_logic import CryptoChatBot
+from crypto_data import load_coin_catalog
+from metrics_utils import Metrics
+from nlp_utils import prepare_nltk_data
+from profile_utils import QueryProfiler, format_profile
+from server_utils import run_server
 
 def print_banner():
     """Display the CryptoBuddy Pro banner"""
@@ -38,7 +45,8 @@ def print_help():
 {Fore.CYAN}🔧 Available Commands:{Style.RESET_ALL}
 {Fore.GREEN}• help{Style.RESET_ALL}           - Show this help message
 {Fore.GREEN}• quit / exit{Style.RESET_ALL}    - Exit CryptoBuddy Pro
-{Fore.GREEN}• status{Style.RESET_ALL}         - Show system status and last data refresh
+{Fore.GREEN}• status{Style.RESET_ALL}         - Show system status, last data refresh and stage timings
+{Fore.GREEN}• profile on|off{Style.RESET_ALL} - Profile queries and print their hot functions
 
 {Fore.CYAN}📊 Example Queries:{Style.RESET_ALL}
 {Fore.YELLOW}• "What's the price of Bitcoin?"
@@ -51,24 +59,112 @@ def print_help():
 """
     print(help_text)
 
-def main():
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="CryptoBuddy Pro - CLI Cryptocurrency Advisor")
+    parser.add_argument("--prepare", action="store_true",
+                        help="download and verify the NLTK data, then exit")
+    parser.add_argument("--serve", action="store_true",
+                        help="answer queries over HTTP/JSON instead of the interactive prompt")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on with --serve")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on with --serve")
+    parser.add_argument("--workers", type=int, default=8, help="queries answered concurrently with --serve")
+    parser.add_argument("--max-pending", type=int, default=32,
+                        help="queries allowed to wait for a worker before new ones get 503")
+    parser.add_argument("--request-timeout", type=float, default=15.0,
+                        help="seconds before a query is answered with 504")
+    parser.add_argument("--api-url", default=os.environ.get("CRYPTOBUDDY_API_URL"),
+                        help="CoinGecko API base URL, e.g. a local coingecko_standin.py server")
+    parser.add_argument("--coin-list", default=os.environ.get("CRYPTOBUDDY_COIN_LIST"),
+                        help="CoinGecko coins/list JSON dump to look up coins outside the built-in database")
+    parser.add_argument("--metrics", action="store_true",
+                        help="time every query stage and API call (also CRYPTOBUDDY_METRICS=1)")
+    parser.add_argument("--metrics-export", metavar="PATH",
+                        help="write stage timings on exit: Prometheus text for .prom, JSONL otherwise (implies --metrics)")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile queries and report their hot functions (toggle with 'profile on|off')")
+    parser.add_argument("--profile-every", type=int, default=1, metavar="N",
+                        help="profile only 1 in N queries, cheap enough to leave on in production")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="functions and allocation sites listed per profiled query")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="also trace allocations of profiled queries with tracemalloc")
+    parser.add_argument("--profile-stacks", metavar="PATH",
+                        help="write collapsed stacks of profiled queries to PATH for flamegraph tools")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main application loop"""
+    args = parse_args(argv)
+    
     # Initialize colorama for cross-platform colored output
     init()
     
+    # One-time setup: fetch NLP data so normal starts never touch the network
+    if args.prepare:
+        return 0 if prepare_nltk_data() else 1
+    
     # Print welcome banner
-    print_banner()
+    if not args.serve:
+        print_banner()
+    
+    if args.coin_list:
+        try:
+            catalog = load_coin_catalog(args.coin_list)
+            print(f"{Fore.GREEN}📚 Loaded {len(catalog):,} coins from {args.coin_list}{Style.RESET_ALL}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"{Fore.YELLOW}⚠️  Could not load coin list {args.coin_list}: {e}{Style.RESET_ALL}")
     
     # Initialize the chatbot
     try:
-        chatbot = CryptoChatBot()
+        metrics = Metrics(enabled=True) if args.metrics or args.metrics_export else None
+        chatbot = CryptoChatBot(api=CoinGeckoAPI(base_url=args.api_url, metrics=metrics))
         print(f"{Fore.GREEN}✅ CryptoBuddy Pro initialized successfully!{Style.RESET_ALL}\n")
     except Exception as e:
         print(f"{Fore.RED}❌ Error initializing CryptoBuddy Pro: {e}{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}💡 Make sure you have an internet connection for live data.{Style.RESET_ALL}")
         return
     
-    # Main chat loop
+    profiler = QueryProfiler(sample_every=args.profile_every, top=args.profile_top, memory=args.profile_memory,
+                             stacks_path=args.profile_stacks, enabled=args.profile)
+    
+    # Refresh hot data in the background so answers never wait on expired cache
+    chatbot.start_background_refresh()
+    
+    try:
+        if args.serve:
+            run_server(chatbot, args.host, args.port, workers=args.workers, max_pending=args.max_pending,
+                       request_timeout=args.request_timeout, profiler=profiler)
+        else:
+            chat_loop(chatbot, profiler)
+    finally:
+        chatbot.stop_background_refresh()
+        if args.metrics_export:
+            try:
+                chatbot.metrics.export(args.metrics_export)
+                print(f"{Fore.GREEN}⏱️  Stage timings written to {args.metrics_export}{Style.RESET_ALL}")
+            except OSError as e:
+                print(f"{Fore.YELLOW}⚠️  Could not write stage timings to {args.metrics_export}: {e}{Style.RESET_ALL}")
+
+# Exact chat commands that control the profiler; anything else is a query
+PROFILE_COMMANDS = ("profile", "profile on", "profile off")
+
+def handle_profile_command(profiler, command):
+    """Turn profiling on or off ("profile on|off"), or show its state ("profile")"""
+    if command != "profile":
+        profiler.enabled = command == "profile on"
+    
+    stats = profiler.stats()
+    state = f"{Fore.GREEN}on" if stats['enabled'] else f"{Fore.YELLOW}off"
+    details = f"1 in {stats['sample_every']} queries, {stats['profiled']} profiled so far"
+    if stats['memory']:
+        details += ", tracing memory"
+    if stats['stacks_path']:
+        details += f", collapsed stacks in {stats['stacks_path']}"
+    print(f"🔬 Profiling {state}{Style.RESET_ALL} ({details})")
+
+def chat_loop(chatbot, profiler=None):
+    """Read queries from the user until they quit"""
     while True:
         try:
             # Get user input
@@ -89,11 +185,24 @@ def main():
             elif user_input.lower() == 'status':
                 chatbot.show_status()
                 continue
+            elif profiler and " ".join(user_input.lower().split()) in PROFILE_COMMANDS:
+                handle_profile_command(profiler, " ".join(user_input.lower().split()))
+                continue
             
-            # Process the query with the chatbot
-            response = chatbot.process_query(user_input)
-            print(f"{Fore.MAGENTA}🤖 CryptoBuddy Pro: {Style.RESET_ALL}{response}\n")
+            if profiler and profiler.should_profile():
+                # Profiled queries are answered in one go so printing stays out of the profile
+                response, report = profiler.profile(chatbot.process_query, user_input, label=user_input)
+                print(f"{Fore.MAGENTA}🤖 CryptoBuddy Pro: {Style.RESET_ALL}{response}\n")
+                if report:
+                    print(format_profile(report) + "\n")
+                continue
             
+            # Stream the answer so its first part shows before slow fetches finish
+            print(f"{Fore.MAGENTA}🤖 CryptoBuddy Pro: {Style.RESET_ALL}", end="", flush=True)
+            for chunk in chatbot.stream_query(user_input):
+                print(chunk, end="", flush=True)
+            print("\n")
+        
         except KeyboardInterrupt:
             print(f"\n{Fore.CYAN}👋 Goodbye! Thanks for using CryptoBuddy Pro!{Style.RESET_ALL}")
             break
@@ -102,4 +211,4 @@ def main():
             print(f"{Fore.YELLOW}💡 Please try rephrasing your question or type 'help' for guidance.{Style.RESET_ALL}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""
+CryptoBuddy Pro - Metrics Utilities
+Per-stage latency histograms with Prometheus and JSONL export
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency buckets in seconds, from 10µs to 30s
+DEFAULT_BUCKETS = tuple(
+    round(mantissa * 10.0 ** exponent, 9)
+    for exponent in range(-5, 2)
+    for mantissa in (1, 2.5, 5)
+    if mantissa * 10.0 ** exponent <= 30
+) + (30.0,)
+
+class Histogram:
+    """Thread-safe latency histogram over fixed buckets"""
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One count per bucket plus the +Inf overflow bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+    
+    def observe(self, seconds):
+        """Record one duration"""
+        index = bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+    
+    def quantile(self, fraction):
+        """Estimate a quantile by interpolating inside the bucket that holds it"""
+        with self.lock:
+            counts = list(self.counts)
+            total = self.count
+            largest = self.max
+        if not total:
+            return 0.0
+        
+        rank = fraction * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else largest
+                return min(lower + (upper - lower) * (rank - seen) / count, largest)
+            seen += count
+        return largest
+    
+    def snapshot(self):
+        """Get the count, sum and estimated percentiles"""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max
+        }
+
+class _Span:
+    """Times a with-block into one histogram"""
+    
+    __slots__ = ("metrics", "name", "started")
+    
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+class _NoSpan:
+    """Stand-in span used while metrics are disabled"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+class Metrics:
+    """Registry of named latency histograms, one per pipeline stage
+    
+    Stages are timed with `with metrics.span("nlp.intent"):`. While
+    disabled, span() hands back a shared do-nothing object, so
+    instrumented code costs one attribute check and no clock reads.
+    Metrics are off unless enabled here or with CRYPTOBUDDY_METRICS=1.
+    """
+    
+    def __init__(self, enabled=None, buckets=DEFAULT_BUCKETS):
+        """Create an empty registry"""
+        if enabled is None:
+            enabled = os.environ.get("CRYPTOBUDDY_METRICS", "").lower() in ("1", "true", "yes", "on")
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+    
+    def span(self, name):
+        """Context manager timing a stage, or a no-op while disabled"""
+        if not self.enabled:
+            return _NO_SPAN
+        return _Span(self, name)
+    
+    def observe(self, name, seconds):
+        """Record a duration for a stage"""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(self.buckets))
+        histogram.observe(seconds)
+    
+    def timed_chunks(self, name, chunks):
+        """Yield from a generator, timing only the work done inside it
+        
+        Time the consumer spends between pieces (printing, sending) is
+        left out, so streamed and joined answers are measured alike.
+        """
+        if not self.enabled:
+            yield from chunks
+            return
+        
+        elapsed = 0.0
+        iterator = iter(chunks)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield chunk
+        finally:
+            self.observe(name, elapsed)
+    
+    def snapshot(self):
+        """Get per-stage statistics, sorted by stage name"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        return {name: histogram.snapshot() for name, histogram in histograms}
+    
+    def reset(self):
+        """Forget every recorded duration"""
+        with self._lock:
+            self._histograms = {}
+    
+    def to_prometheus(self, metric="cryptobuddy_stage_seconds"):
+        """Render every histogram in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+        
+        lines = [f"# HELP {metric} Time spent in each query processing stage.", f"# TYPE {metric} histogram"]
+        for name, histogram in histograms:
+            with histogram.lock:
+                counts = list(histogram.counts)
+                total, seconds = histogram.count, histogram.sum
+            
+            stage = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {total}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {seconds:.9f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {total}')
+        return "\n".join(lines) + "\n"
+    
+    def to_jsonl(self):
+        """One JSON object per stage with its statistics and a timestamp"""
+        timestamp = time.time()
+        return "".join(
+            json.dumps({"timestamp": timestamp, "stage": name, **stats}) + "\n"
+            for name, stats in self.snapshot().items()
+        )
+    
+    def export(self, path):
+        """Write the metrics to a file: Prometheus text for .prom/.txt, JSONL appended otherwise"""
+        if os.path.splitext(path)[1].lower() in (".prom", ".txt"):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(self.to_jsonl())
@@ -3,33 +3,491 @@ CryptoBuddy Pro - NLP Utilities
 Natural Language Processing for query understanding and intent detection
 """
 
-import nltk
 import re
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-from nltk.sentiment import SentimentIntensityAnalyzer
+import threading
+from collections import Counter, namedtuple
+from itertools import chain
+from operator import itemgetter
 from colorama import Fore, Style
+from crypto_data import CRYPTO_DATABASE, get_coin_catalog
 
+# NLTK data used by NLPProcessor: download name -> nltk.data path
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'omw-1.4': 'corpora/omw-1.4',
+    'vader_lexicon': 'sentiment/vader_lexicon.zip'
+}
 
-nltk.download('vader_lexicon')
+FALLBACK_STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
+
+# Everyday words that are a typo away from (or equal to) some coin's name
+COMMON_QUERY_WORDS = frozenset({
+    'about', 'better', 'buy', 'coin', 'coins', 'crypto', 'cryptos', 'either', 'falling', 'good', 'market',
+    'money', 'other', 'please', 'rising', 'sell', 'should', 'tell', 'thanks', 'there', 'think', 'today',
+    'token', 'tokens', 'whether'
+})
+
+def missing_nltk_resources():
+    """List the NLTK resources that are not installed locally"""
+    import nltk
+    
+    missing = []
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            missing.append(name)
+    return missing
+
+def prepare_nltk_data():
+    """Download and verify all NLTK data; returns True if everything is available"""
+    import nltk
+    
+    for name in missing_nltk_resources():
+        print(f"{Fore.YELLOW}📥 Downloading NLTK data: {name}...{Style.RESET_ALL}")
+        nltk.download(name, quiet=True)
+    
+    missing = missing_nltk_resources()
+    if missing:
+        print(f"{Fore.RED}❌ Missing NLTK data: {', '.join(missing)}{Style.RESET_ALL}")
+        return False
+    
+    print(f"{Fore.GREEN}✅ All NLTK data is installed.{Style.RESET_ALL}")
+    return True
+
+IntentMatch = namedtuple('IntentMatch', ['intent', 'pattern', 'start', 'end', 'text'])
+
+# Leading literal of a pattern: \bword or \b(word|word), plus what follows it
+_PATTERN_ANCHOR = re.compile(r'\\b(?:\(([\w |]+)\)|([\w ]+))(.?)')
+
+def _pattern_anchors(pattern):
+    """Get the literal words a pattern must start with, or None if it has none"""
+    match = _PATTERN_ANCHOR.match(pattern)
+    if not match:
+        return None
+    if match.group(1):
+        return match.group(1).split('|')
+    
+    word = match.group(2)
+    if match.group(3) in ('?', '*', '{'):
+        # The last character is optional, so it cannot be part of the anchor
+        word = word[:-1]
+    return [word] if word else None
+
+class IntentMatcher:
+    """All intent patterns behind one compiled keyword scan
+    
+    Every pattern starts with a literal word (its anchor). One regex over
+    all anchors finds every candidate in a single pass over the text, and
+    only patterns whose anchor occurred are run, starting at the anchor.
+    """
+    
+    def __init__(self, intent_patterns):
+        """Compile the patterns and the combined anchor scanner"""
+        self.intents = list(intent_patterns)
+        self._pattern_intents = []
+        self._pattern_sources = []
+        self._regexes = []
+        self._unanchored = []
+        anchored = {}
+        
+        for intent, patterns in intent_patterns.items():
+            for pattern in patterns:
+                index = len(self._regexes)
+                self._pattern_intents.append(intent)
+                self._pattern_sources.append(pattern)
+                self._regexes.append(re.compile(pattern, re.IGNORECASE))
+                
+                anchors = _pattern_anchors(pattern)
+                if anchors is None:
+                    self._unanchored.append(index)
+                for anchor in anchors or ():
+                    anchored.setdefault(anchor.lower(), []).append(index)
+        
+        # A matched anchor also implies every shorter anchor that prefixes it
+        self._candidates = {
+            anchor: tuple(index for other, indexes in anchored.items() if anchor.startswith(other) for index in indexes)
+            for anchor in anchored
+        }
+        self.keywords = frozenset(anchored)
+        alternatives = sorted(anchored, key=len, reverse=True)
+        self.scanner = re.compile(r'\b(?:' + '|'.join(re.escape(anchor) for anchor in alternatives) + ')', re.IGNORECASE)
+    
+    def _scan(self, text):
+        """Map each candidate pattern to the first position its anchor occurs"""
+        candidates = dict.fromkeys(self._unanchored, 0)
+        for anchor in self.scanner.finditer(text):
+            start = anchor.start()
+            for index in self._candidates[anchor.group().lower()]:
+                if index not in candidates:
+                    candidates[index] = start
+        return candidates
+    
+    def detect(self, text):
+        """Get every intent that matches text, in declaration order"""
+        matched = set()
+        for index, start in self._scan(text).items():
+            intent = self._pattern_intents[index]
+            if intent not in matched and self._regexes[index].search(text, start):
+                matched.add(intent)
+        return [intent for intent in self.intents if intent in matched]
+    
+    def explain(self, text):
+        """Get the pattern and span behind each match, for debugging"""
+        matches = []
+        for index, start in sorted(self._scan(text).items()):
+            match = self._regexes[index].search(text, start)
+            if match:
+                matches.append(IntentMatch(self._pattern_intents[index], self._pattern_sources[index],
+                                           match.start(), match.end(), match.group()))
+        return matches
+
+_WORD = re.compile(r'\w+')
+
+class CryptoEntityIndex:
+    """Token trie over every name, symbol and alias in a coin database
+    
+    Terms are split into word tokens ("matic-network" -> matic, network),
+    so multi-word names match and a scan costs one pass over the query's
+    tokens no matter how many coins are indexed. A CoinCatalog's ids,
+    names and symbols are added after the database, keyed by CoinGecko
+    id; catalog terms made only of `ignore` words or numbers, and
+    symbols shorter than three letters, are left out so everyday words
+    in a query are not read as coins.
+    """
+    
+    def __init__(self, crypto_database=None, catalog=None, ignore=()):
+        """Build the trie from the database (CRYPTO_DATABASE by default), then the catalog"""
+        self.root = {}
+        self.max_depth = 0
+        self.catalog = catalog
+        for coin_key, crypto in (crypto_database or CRYPTO_DATABASE).items():
+            for term in self._terms(coin_key, crypto):
+                self.add(term, coin_key)
+        
+        if catalog is not None:
+            for row in range(len(catalog)):
+                coin_id = catalog.coin_id(row)
+                for term in self._catalog_terms(catalog, row):
+                    tokens = _WORD.findall(term.lower())
+                    if not all(token in ignore or token.isdigit() for token in tokens):
+                        self.add(term, coin_id)
+    
+    def _terms(self, coin_key, crypto):
+        """Every way a coin can be referred to"""
+        yield coin_key
+        yield crypto['name']
+        yield crypto['symbol']
+        yield crypto['coingecko_id']
+        yield from crypto.get('aliases', ())
+    
+    @staticmethod
+    def _catalog_terms(catalog, row):
+        """Every way a catalog coin can be referred to"""
+        yield catalog.coin_id(row)
+        yield catalog.name(row)
+        symbol = catalog.symbol(row)
+        if len(symbol) >= 3:
+            yield symbol
+    
+    def add(self, term, coin_key):
+        """Index a term for a coin; the first coin to claim a term keeps it"""
+        tokens = _WORD.findall(term.lower())
+        if not tokens:
+            return
+        
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(None, coin_key)
+        self.max_depth = max(self.max_depth, len(tokens))
+    
+    def lookup(self, term):
+        """Get the coin a whole term refers to, or None"""
+        node = self.root
+        for token in _WORD.findall(term.lower()):
+            node = node.get(token)
+            if node is None:
+                return None
+        return node.get(None)
+    
+    def find_all(self, text):
+        """Get the canonical coin keys mentioned in text, in order of first mention"""
+        tokens = _WORD.findall(text.lower())
+        found = {}
+        
+        i = 0
+        while i < len(tokens):
+            # Longest match starting at this token
+            node = self.root
+            match, match_end = None, i
+            for j in range(i, min(len(tokens), i + self.max_depth)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if None in node:
+                    match, match_end = node[None], j + 1
+            
+            if match is not None:
+                found.setdefault(match)
+                i = match_end
+            else:
+                i += 1
+        
+        return list(found)
+
+def bounded_edit_distance(a, b, limit):
+    """Edit distance between a and b counting a swap of neighbours as one edit
+    
+    Returns limit + 1 for anything further apart. The shared prefix and
+    suffix are skipped, and only cells within limit of the diagonal are
+    filled, row by row, stopping as soon as a whole row exceeds limit.
+    """
+    start = 0
+    shortest = min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    
+    too_far = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return too_far
+    if not a or not b:
+        return len(a) + len(b)
+    if limit <= 1:
+        # What is left must be one substitution, insertion, deletion or swap
+        if len(a) + len(b) <= 2 or (len(a) == len(b) == 2 and a == b[::-1]):
+            return 1
+        return too_far
+    
+    # Cells outside the band stay at too_far, which is as good as infinite here
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        current = [i] + [too_far] * len(b)
+        row_best = i
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            char_b = b[j - 1]
+            cost = previous[j - 1] + (char_a != char_b)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b and before_previous[j - 2] + 1 < cost:
+                cost = before_previous[j - 2] + 1
+            current[j] = cost
+            if cost < row_best:
+                row_best = cost
+        if row_best > limit:
+            return too_far
+        before_previous, previous = previous, current
+    return min(previous[-1], too_far)
+
+FuzzyMatch = namedtuple('FuzzyMatch', ['coin_key', 'term', 'distance'])
+
+# Number of set bits in an int; int.bit_count is much faster but needs Python 3.10
+_popcount = getattr(int, "bit_count", None) or (lambda value: bin(value).count("1"))
+
+def _letter_mask(term):
+    """Bit set of the characters in a term (characters may share a bit, which only loosens the bound)"""
+    mask = 0
+    for char in term:
+        mask |= 1 << (ord(char) & 127)
+    return mask
+
+class FuzzyCoinIndex:
+    """Positional trigram index for resolving misspelled coin names
+    
+    A misspelling within k edits keeps all but 4k of its trigrams (a swap
+    of neighbours touches 4), each within k places of where it was. So a
+    lookup only counts trigrams found near the same position, and just the
+    terms that share enough of them, differ in length by at most k and
+    differ by at most k distinct letters get a real edit distance check:
+    those sharing the most trigrams first, and no more than MAX_CHECKED
+    of them. Names of six letters or more may hold two edits ("cardona")
+    as long as the first letter is right.
+    """
+    
+    MIN_LENGTH = 5
+    
+    # Most edit distance checks a single lookup may run
+    MAX_CHECKED = 32
+    
+    def __init__(self, terms=()):
+        """Index (term, coin_key) pairs"""
+        self.catalog = None
+        self.terms = []
+        self.coin_keys = []
+        self.lengths = []
+        self.letter_masks = []
+        self.max_words = 1
+        self._known = {}
+        self._grams = {}
+        for term, coin_key in terms:
+            self.add(term, coin_key)
+    
+    @classmethod
+    def from_database(cls, crypto_database, catalog=None):
+        """Index the names and aliases of a coin database, then a CoinCatalog's names"""
+        index = cls()
+        index.catalog = catalog
+        for coin_key, crypto in crypto_database.items():
+            for term in (coin_key, crypto['name'], *crypto.get('aliases', ())):
+                index.add(term, coin_key)
+        
+        if catalog is not None:
+            for row in range(len(catalog)):
+                index.add(catalog.name(row), catalog.coin_id(row))
+        return index
+    
+    @staticmethod
+    def _trigrams(term):
+        """The trigrams of a term padded with one marker at each end, one per character"""
+        padded = f"${term}$"
+        return [padded[i:i + 3] for i in range(len(term))]
+    
+    @staticmethod
+    def max_distance(length):
+        """How many edits a term of this length may contain"""
+        return 1 if length < 6 else 2
+    
+    def add(self, term, coin_key):
+        """Index a term for a coin; terms too short to fuzz and repeats are ignored"""
+        term = ' '.join(_WORD.findall(term.lower()))
+        if len(term) < self.MIN_LENGTH or term in self._known:
+            return
+        
+        term_id = len(self.terms)
+        self._known[term] = term_id
+        self.terms.append(term)
+        self.coin_keys.append(coin_key)
+        self.lengths.append(len(term))
+        self.letter_masks.append(_letter_mask(term))
+        self.max_words = max(self.max_words, term.count(' ') + 1)
+        for position, gram in enumerate(self._trigrams(term)):
+            self._grams.setdefault((gram, position), []).append(term_id)
+    
+    def search(self, word, limit=5):
+        """Get up to limit matches for word, closest first"""
+        word = word.lower()
+        exact = self._known.get(word)
+        if exact is not None and limit == 1:
+            return [FuzzyMatch(self.coin_keys[exact], word, 0)]
+        
+        max_distance = self.max_distance(len(word))
+        postings = self._grams
+        shared = Counter(chain.from_iterable(
+            postings.get((gram, near), ())
+            for position, gram in enumerate(self._trigrams(word))
+            for near in range(max(position - max_distance, 0), position + max_distance + 1)
+        ))
+        
+        # A term may only hold two edits when its first letter is right, which keeps
+        # ordinary words ("better") from turning into coins ("ether"); every other
+        # term gets one edit and must share all but 4 trigrams. Each edit also
+        # changes the length by at most one and brings in or drops at most one
+        # distinct letter. All of this is checked in one pass before anything costlier.
+        length = len(word)
+        one_edit_required = length - 4
+        required = max(length - 4 * max_distance, 1)
+        first = word[0]
+        terms = self.terms
+        lengths = self.lengths
+        letters = _letter_mask(word)
+        masks = self.letter_masks
+        popcount = _popcount
+        shortest, longest = length - max_distance, length + max_distance
+        shortlist = [
+            (term_id, count) for term_id, count in shared.items()
+            if shortest <= lengths[term_id] <= longest
+            and (count >= one_edit_required or (count >= required and terms[term_id][0] == first))
+            and popcount(letters & ~masks[term_id]) <= max_distance
+            and popcount(masks[term_id] & ~letters) <= max_distance
+        ]
+        
+        # Check the terms sharing the most trigrams first, at most MAX_CHECKED of
+        # them. A term within d edits shares at least length - 4d trigrams, so
+        # once the matches found are d edits away the rest of the list can go.
+        shortlist.sort(key=itemgetter(1), reverse=True)
+        ranked = []
+        worst = max_distance
+        checked = 0
+        for term_id, count in shortlist:
+            if count < length - 4 * worst or checked >= self.MAX_CHECKED:
+                break
+            term_length = lengths[term_id]
+            allowed = min(worst, max_distance if terms[term_id][0] == first else 1)
+            if count < term_length - 4 * allowed:
+                continue
+            mask = masks[term_id]
+            if max(abs(term_length - length), popcount(letters & ~mask), popcount(mask & ~letters)) > allowed:
+                continue
+            
+            checked += 1
+            distance = bounded_edit_distance(word, terms[term_id], allowed)
+            if distance <= allowed:
+                ranked.append((distance, -count, term_id))
+                if len(ranked) >= limit:
+                    ranked.sort()
+                    del ranked[limit:]
+                    worst = ranked[-1][0]
+        
+        ranked.sort()
+        return [FuzzyMatch(self.coin_keys[term_id], self.terms[term_id], distance)
+                for distance, _, term_id in ranked[:limit]]
+    
+    def find_all(self, text, ignore=()):
+        """Get the coin keys of misspelled names in text, in order of first mention
+        
+        Longer phrases are tried first at each position; words in ignore
+        are never treated as a misspelled name on their own.
+        """
+        tokens = _WORD.findall(text.lower())
+        found = {}
+        
+        i = 0
+        while i < len(tokens):
+            match_end = i + 1
+            for end in range(min(len(tokens), i + self.max_words), i, -1):
+                phrase = ' '.join(tokens[i:end])
+                if len(phrase) < self.MIN_LENGTH or phrase.isdigit() or (end == i + 1 and phrase in ignore):
+                    continue
+                matches = self.search(phrase, limit=1)
+                if matches:
+                    found.setdefault(matches[0].coin_key)
+                    match_end = end
+                    break
+            i = match_end
+        
+        return list(found)
 
 class NLPProcessor:
-    """Natural Language Processing utilities for CryptoBuddy Pro"""
+    """Natural Language Processing utilities for CryptoBuddy Pro
+    
+    NLTK and its data are only loaded the first time a feature needs them,
+    and nothing is downloaded at runtime. Run `python main.py --prepare`
+    once to fetch the data; until then the fallbacks below are used.
+    """
     
     def __init__(self):
         """Initialize NLP components"""
-        self.lemmatizer = WordNetLemmatizer()
-        self.sia = SentimentIntensityAnalyzer()
+        self._lemmatizer = None
+        self._sia = None
+        self._stop_words = None
+        self._fuzzy_index = None
+        self._crypto_index = None
+        self._warned_missing = set()
         
-        # Download required NLTK data
-        self._download_nltk_data()
-        
-        # Load stop words
-        try:
-            self.stop_words = set(stopwords.words('english'))
-        except:
-            self.stop_words = set(['the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'])
+        # NLTK's lazy corpus loaders are not safe to trigger from several threads at once
+        self._load_lock = threading.Lock()
         
         # Define intent patterns
         self.intent_patterns = {
@@ -77,52 +535,82 @@ class NLPProcessor:
             'top_coins': [
                 r'\btop\b.*\d+',
                 r'\bbest\b.*\d+',
-                r'\\klargest\b.*\d+',
+                r'\blargest\b.*\d+',
                 r'\blist.*coin\b'
             ]
         }
         
-        # Cryptocurrency name patterns
-        self.crypto_patterns = [
-            r'\bbitcoin\b', r'\bbtc\b',
-            r'\bethereum\b', r'\beth\b', 
-            r'\bcardano\b', r'\bada\b',
-            r'\bsolana\b', r'\bsol\b',
-            r'\bpolygon\b', r'\bmatic\b',
-            r'\balgorand\b', r'\balgo\b',
-            r'\bchainlink\b', r'\blink\b',
-            r'\blitecoin\b', r'\bltc\b',
-            r'\bstellar\b', r'\bxlm\b',
-            r'\btezos\b', r'\bxtz\b'
-        ]
+        self.intent_matcher = IntentMatcher(self.intent_patterns)
     
-    def _download_nltk_data(self):
-        """Download required NLTK data"""
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            print(f"{Fore.YELLOW}📥 Downloading NLTK data...{Style.RESET_ALL}")
-            nltk.download('punkt', quiet=True)
-        
-        try:
-            nltk.data.find('corpora/stopwords')
-        except LookupError:
-            nltk.download('stopwords', quiet=True)
-        
-        try:
-            nltk.data.find('corpora/wordnet')
-        except LookupError:
-            nltk.download('wordnet', quiet=True)
-        
-        try:
-            nltk.data.find('corpora/omw-1.4')
-        except LookupError:
-            nltk.download('omw-1.4', quiet=True)
-        
-        try:
-            nltk.data.find('vader_lexicon')
-        except LookupError:
-            nltk.download('vader_lexicon', quiet=True)
+    def _warn_missing(self, resource):
+        """Point the user at --prepare the first time a resource is missing"""
+        if resource not in self._warned_missing:
+            self._warned_missing.add(resource)
+            print(f"{Fore.YELLOW}💡 NLTK data '{resource}' not found; run 'python main.py --prepare' for full NLP support.{Style.RESET_ALL}")
+    
+    @property
+    def lemmatizer(self):
+        """WordNet lemmatizer, created on first use"""
+        if self._lemmatizer is None:
+            with self._load_lock:
+                if self._lemmatizer is None:
+                    from nltk.stem import WordNetLemmatizer
+                    self._lemmatizer = WordNetLemmatizer()
+        return self._lemmatizer
+    
+    @property
+    def sia(self):
+        """VADER sentiment analyzer, loaded on first use (None if its lexicon is missing)"""
+        if self._sia is None:
+            with self._load_lock:
+                if self._sia is None:
+                    from nltk.sentiment import SentimentIntensityAnalyzer
+                    try:
+                        self._sia = SentimentIntensityAnalyzer()
+                    except LookupError:
+                        self._warn_missing('vader_lexicon')
+                        self._sia = False
+        return self._sia or None
+    
+    @property
+    def crypto_index(self):
+        """Names, symbols and aliases of the database and any loaded coin list, rebuilt when the list changes"""
+        catalog = get_coin_catalog()
+        index = self._crypto_index
+        if index is None or index.catalog is not catalog:
+            # Worked out before taking the lock, which loading stop words needs too
+            ignore = self.stop_words | self.intent_matcher.keywords | COMMON_QUERY_WORDS if catalog is not None else ()
+            with self._load_lock:
+                index = self._crypto_index
+                if index is None or index.catalog is not catalog:
+                    index = self._crypto_index = CryptoEntityIndex(CRYPTO_DATABASE, catalog, ignore)
+        return index
+    
+    @property
+    def fuzzy_index(self):
+        """Misspelling index over the database and any loaded coin list, rebuilt when the list changes"""
+        catalog = get_coin_catalog()
+        index = self._fuzzy_index
+        if index is None or index.catalog is not catalog:
+            with self._load_lock:
+                index = self._fuzzy_index
+                if index is None or index.catalog is not catalog:
+                    index = self._fuzzy_index = FuzzyCoinIndex.from_database(CRYPTO_DATABASE, catalog)
+        return index
+    
+    @property
+    def stop_words(self):
+        """English stop words, loaded on first use"""
+        if self._stop_words is None:
+            with self._load_lock:
+                if self._stop_words is None:
+                    from nltk.corpus import stopwords
+                    try:
+                        self._stop_words = set(stopwords.words('english'))
+                    except LookupError:
+                        self._warn_missing('stopwords')
+                        self._stop_words = FALLBACK_STOP_WORDS
+        return self._stop_words
     
     def preprocess_text(self, text):
         """Preprocess text: tokenize, remove stop words, lemmatize"""
@@ -131,6 +619,7 @@ class NLPProcessor:
         
         # Tokenize
         try:
+            from nltk.tokenize import word_tokenize
             tokens = word_tokenize(text)
         except:
             # Fallback tokenization
@@ -150,34 +639,28 @@ class NLPProcessor:
     
     def detect_intent(self, text):
         """Detect user intent from text"""
-        text = text.lower()
-        detected_intents = []
-        
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    detected_intents.append(intent)
-                    break
-        
+        detected_intents = self.intent_matcher.detect(text)
         return detected_intents if detected_intents else ['general_query']
     
+    def explain_intent(self, text):
+        """Show which pattern triggered each detected intent and where"""
+        return self.intent_matcher.explain(text)
+    
     def extract_cryptocurrencies(self, text):
-        """Extract cryptocurrency names/symbols from text"""
-        text = text.lower()
-        found_cryptos = []
-        
-        for pattern in self.crypto_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            found_cryptos.extend(matches)
+        """Extract cryptocurrencies from text as canonical database keys
         
-        # Remove duplicates and normalize
-        unique_cryptos = []
-        for crypto in found_cryptos:
-            crypto = crypto.lower()
-            if crypto not in [c.lower() for c in unique_cryptos]:
-                unique_cryptos.append(crypto)
+        Misspelled names are only looked for when no coin is named exactly.
+        """
+        found = self.crypto_index.find_all(text)
+        if found:
+            return found
         
-        return unique_cryptos
+        ignore = self.stop_words | self.intent_matcher.keywords | COMMON_QUERY_WORDS
+        return self.fuzzy_index.find_all(text, ignore)
+    
+    def suggest_cryptocurrencies(self, name, limit=5):
+        """Rank the coins a possibly misspelled name could refer to"""
+        return self.fuzzy_index.search(name, limit)
     
     def extract_numbers(self, text):
         """Extract numbers from text"""
@@ -227,18 +710,5 @@ class NLPProcessor:
         """Normalize cryptocurrency name for database lookup"""
         crypto_name = crypto_name.lower().strip()
         
-        # Handle common variations
-        name_mappings = {
-            'btc': 'bitcoin',
-            'eth': 'ethereum', 
-            'ada': 'cardano',
-            'sol': 'solana',
-            'matic': 'polygon',
-            'algo': 'algorand',
-            'link': 'chainlink',
-            'ltc': 'litecoin',
-            'xlm': 'stellar',
-            'xtz': 'tezos'
-        }
-        
-        return name_mappings.get(crypto_name, crypto_name)
\ No newline at end of file
+        # Symbols and aliases map to the coin's database key
+        return self.crypto_index.lookup(crypto_name) or crypto_name
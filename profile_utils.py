@@ -0,0 +1,243 @@
+"""
+CryptoBuddy Pro - Profiling Utilities
+On-demand per-query CPU and memory profiling with flamegraph output
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, namedtuple
+from colorama import Fore, Style
+
+# What one profiled query spent its time and memory on
+QueryProfile = namedtuple('QueryProfile', ['label', 'elapsed', 'engine', 'functions', 'allocations', 'peak_memory'])
+
+# One row of the hot function table; times are in seconds
+FunctionStats = namedtuple('FunctionStats', ['name', 'calls', 'self_time', 'cumulative_time'])
+
+# One allocation site still holding memory when the query finished
+AllocationSite = namedtuple('AllocationSite', ['site', 'size', 'count'])
+
+def _code_name(filename, lineno, funcname):
+    """Short readable name for a Python function"""
+    if filename == "~":
+        # Built-ins are reported by cProfile as ('~', 0, '<built-in method ...>')
+        return funcname
+    return f"{os.path.basename(filename)}:{lineno}({funcname})"
+
+class _StackTracer:
+    """Exact call stacks with self time, recorded through sys.setprofile
+    
+    Much slower than cProfile, so it is only used when collapsed stacks
+    are wanted. Generators that yield and resume show up as returns and
+    calls, so streamed handlers land under whoever resumed them.
+    """
+    
+    def __init__(self):
+        # Each open frame is [label, started, time spent in callees]
+        self.frames = []
+        self.stacks = Counter()
+        self.functions = {}
+        self._depths = Counter()
+    
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == "call":
+            code = frame.f_code
+            self._push(_code_name(code.co_filename, code.co_firstlineno, code.co_name), now)
+        elif event == "c_call":
+            self._push(getattr(arg, "__qualname__", None) or repr(arg), now)
+        elif self.frames:
+            # return, c_return or c_exception
+            self._pop(now)
+    
+    def _push(self, label, now):
+        self.frames.append([label, now, 0.0])
+        self._depths[label] += 1
+    
+    def _pop(self, now):
+        label, started, in_callees = self.frames[-1]
+        elapsed = now - started
+        self.stacks[";".join(frame[0] for frame in self.frames)] += elapsed - in_callees
+        self.frames.pop()
+        self._depths[label] -= 1
+        
+        calls, self_time, cumulative = self.functions.get(label, (0, 0.0, 0.0))
+        # Recursive calls only count towards cumulative time once
+        outermost = self._depths[label] == 0
+        self.functions[label] = (calls + 1, self_time + elapsed - in_callees, cumulative + (elapsed if outermost else 0.0))
+        if self.frames:
+            self.frames[-1][2] += elapsed
+    
+    def finish(self):
+        """Close frames still open when tracing stopped"""
+        now = time.perf_counter()
+        while self.frames:
+            self._pop(now)
+
+class QueryProfiler:
+    """Profiles 1 in every `sample_every` queries it is handed
+    
+    A profiled query runs under cProfile (or, when stacks_path is set, an
+    exact stack tracer that also feeds a collapsed-stack file for
+    flamegraph.pl or speedscope) and optionally tracemalloc. The report
+    lists the top functions by self time and the allocation sites still
+    holding memory afterwards. Only one query is profiled at a time;
+    queries arriving meanwhile simply run unprofiled, so leaving the
+    profiler on with a large sample_every is safe under load.
+    """
+    
+    def __init__(self, sample_every=1, top=10, memory=False, stacks_path=None, enabled=True):
+        """Configure the profiler; nothing is traced until a sampled query runs"""
+        self.enabled = enabled
+        self.sample_every = max(1, int(sample_every))
+        self.top = top
+        self.memory = memory
+        self.stacks_path = stacks_path
+        
+        # Self time per collapsed stack, summed over every profiled query
+        self.stacks = Counter()
+        self.last_report = None
+        
+        self.seen = 0
+        self.profiled = 0
+        self.busy = 0
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+    
+    def should_profile(self):
+        """Count a query and decide whether it is the one in sample_every to profile"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            self.seen += 1
+            return self.seen % self.sample_every == 0
+    
+    def profile(self, fn, *args, label=None):
+        """Call fn(*args) under the profiler; returns (result, report or None if another query holds it)"""
+        if not self._active.acquire(blocking=False):
+            # Another query is being profiled right now
+            with self._lock:
+                self.busy += 1
+            return fn(*args), None
+        
+        try:
+            return self._profile(fn, args, label)
+        finally:
+            self._active.release()
+    
+    def _profile(self, fn, args, label):
+        """Run one query under the CPU profiler and, if asked, tracemalloc"""
+        trace_memory = self.memory and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start()
+        
+        tracer = _StackTracer() if self.stacks_path else None
+        profiler = None if tracer else cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            if tracer:
+                sys.setprofile(tracer)
+                try:
+                    result = fn(*args)
+                finally:
+                    sys.setprofile(None)
+                    tracer.finish()
+            else:
+                result = profiler.runcall(fn, *args)
+            elapsed = time.perf_counter() - started
+            
+            allocations, peak = [], None
+            if self.memory and tracemalloc.is_tracing():
+                peak = tracemalloc.get_traced_memory()[1]
+                snapshot = tracemalloc.take_snapshot().filter_traces([
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__)
+                ])
+                allocations = [
+                    AllocationSite(f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                                   stat.size, stat.count)
+                    for stat in snapshot.statistics("lineno")[:self.top]
+                ]
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+        
+        if tracer:
+            functions = [FunctionStats(name, *totals) for name, totals in tracer.functions.items()]
+            self._add_stacks(tracer.stacks)
+        else:
+            functions = [
+                FunctionStats(_code_name(*key), calls, self_time, cumulative)
+                for key, (_, calls, self_time, cumulative, _) in pstats.Stats(profiler).stats.items()
+            ]
+        functions.sort(key=lambda stats: stats.self_time, reverse=True)
+        
+        report = QueryProfile(label, elapsed, "stacks" if tracer else "cProfile",
+                              functions[:self.top], allocations, peak)
+        with self._lock:
+            self.profiled += 1
+            self.last_report = report
+        return result, report
+    
+    def _add_stacks(self, stacks):
+        """Merge a query's stacks into the running totals and rewrite the stacks file"""
+        with self._lock:
+            for stack, seconds in stacks.items():
+                # flamegraph tools want integer weights; use microseconds
+                self.stacks[stack] += max(int(seconds * 1e6), 1)
+            lines = [f"{stack} {weight}\n" for stack, weight in sorted(self.stacks.items())]
+        
+        try:
+            self.write_stacks(self.stacks_path, lines)
+        except OSError as e:
+            print(f"{Fore.YELLOW}⚠️  Could not write collapsed stacks to {self.stacks_path}: {e}{Style.RESET_ALL}")
+    
+    def write_stacks(self, path, lines=None):
+        """Atomically write the collapsed stacks (`frame;frame;frame weight` per line) to path"""
+        if lines is None:
+            with self._lock:
+                lines = [f"{stack} {weight}\n" for stack, weight in sorted(self.stacks.items())]
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".stacks-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    
+    def stats(self):
+        """Get the profiler's settings and counters"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_every": self.sample_every,
+                "memory": self.memory,
+                "stacks_path": self.stacks_path,
+                "seen": self.seen,
+                "profiled": self.profiled,
+                "skipped_busy": self.busy,
+                "stacks": len(self.stacks)
+            }
+
+def format_profile(report):
+    """Render a query profile as a short text report"""
+    title = f"🔬 Profile of {report.label!r}" if report.label else "🔬 Query profile"
+    lines = [f"{Fore.CYAN}{title}: {report.elapsed * 1000:.2f} ms ({report.engine}){Style.RESET_ALL}",
+             f"   {'self ms':>9} {'cum ms':>9} {'calls':>7}  function"]
+    for stats in report.functions:
+        lines.append(f"   {stats.self_time * 1000:9.3f} {stats.cumulative_time * 1000:9.3f} {stats.calls:7}  {stats.name}")
+    
+    if report.peak_memory is not None:
+        lines.append(f"{Fore.CYAN}   Peak traced memory: {report.peak_memory / 1024:.1f} KiB; still allocated by:{Style.RESET_ALL}")
+        for site in report.allocations:
+            lines.append(f"   {site.size / 1024:9.1f} KiB {site.count:7} blocks  {site.site}")
+    return "\n".join(lines)
@@ -0,0 +1,383 @@
+"""
+CryptoBuddy Pro - Server Utilities
+Asyncio HTTP/JSON front end serving many chat sessions from one chatbot
+"""
+
+import asyncio
+import functools
+import json
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qsl
+from colorama import Fore, Style
+from profile_utils import format_profile
+
+class HTTPError(Exception):
+    """A request that is answered with an error status"""
+    
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+class JSONServer:
+    """Minimal asyncio HTTP/1.1 server with keep-alive that answers in JSON
+    
+    Subclasses override _respond(writer, request, keep_alive), where
+    request is (method, path, params, headers, body), and either write a
+    response or raise HTTPError; the base server answers 404 to everything.
+    """
+    
+    MAX_HEADERS = 100
+    
+    def __init__(self, host="127.0.0.1", port=8080, idle_timeout=30.0, max_body=16384):
+        """Configure the server; nothing listens until start()"""
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.max_body = max_body
+        
+        self.server = None
+        self.started_at = None
+        self.requests = 0
+    
+    async def start(self):
+        """Start listening; returns the (host, port) actually bound"""
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.started_at = time.time()
+        return self.server.sockets[0].getsockname()[:2]
+    
+    async def serve_forever(self):
+        """Start if needed and serve until cancelled"""
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+    
+    async def close(self):
+        """Stop accepting connections and wait for the listener to close"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+    
+    async def _handle_connection(self, reader, writer):
+        """Serve requests on one keep-alive connection until it closes"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except HTTPError as e:
+                    await self._send(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                
+                keep_alive = request[3].get("connection", "").lower() != "close"
+                self.requests += 1
+                try:
+                    await self._respond(writer, request, keep_alive)
+                except HTTPError as e:
+                    await self._send(writer, e.status, {"error": str(e)}, keep_alive, e.headers)
+                
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+    
+    async def _respond(self, writer, request, keep_alive):
+        """Answer one request; without routes every path is not found"""
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {request[1]}")
+    
+    async def _read_request(self, reader):
+        """Read one request as (method, path, params, headers, body), or None at end of stream"""
+        request_line = await self._read_line(reader)
+        if not request_line.strip():
+            return None
+        
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        
+        headers = {}
+        while True:
+            line = await self._read_line(reader)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= self.MAX_HEADERS:
+                raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        
+        if "transfer-encoding" in headers:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked request bodies are not supported")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > self.max_body:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        
+        body = await reader.readexactly(length) if length else b""
+        path, _, query_string = target.partition("?")
+        return method.upper(), path, dict(parse_qsl(query_string)), headers, body
+    
+    async def _read_line(self, reader):
+        """Read one request or header line, refusing lines longer than the stream limit"""
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request line or header too long")
+    
+    def _head(self, status, headers):
+        """Encode a status line and headers"""
+        status = HTTPStatus(status)
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        return head.encode("latin-1") + b"\r\n"
+    
+    async def _send(self, writer, status, payload, keep_alive=True, extra_headers=None):
+        """Write a JSON response"""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(extra_headers or {})
+        }
+        writer.write(self._head(status, headers) + body)
+        await writer.drain()
+    
+    async def _send_text(self, writer, status, text, content_type, keep_alive=True):
+        """Write a plain-text response"""
+        body = text.encode("utf-8")
+        headers = {
+            "Content-Type": content_type,
+            "Content-Length": str(len(body)),
+            "Connection": "keep-alive" if keep_alive else "close"
+        }
+        writer.write(self._head(status, headers) + body)
+        await writer.drain()
+
+class ChatServer(JSONServer):
+    """HTTP/JSON server sharing one CryptoChatBot (API client, cache, NLP) across clients
+    
+    POST /query with {"query": "..."} answers a question; POST
+    /query/stream takes the same body and sends the answer as chunked
+    newline-delimited JSON, one line per piece as soon as it is ready,
+    then a {"done": true} line. GET /health returns the bot's status
+    data plus server counters, and GET /metrics the stage timings in
+    Prometheus text format (JSONL with ?format=jsonl). At most `workers`
+    queries are answered at once and up to `max_pending` more may wait for
+    a slot; beyond that requests get 503 with Retry-After. A query that
+    takes longer than `request_timeout` seconds gets 504.
+    
+    Pass a chatbot built around a stubbed CoinGeckoAPI to run it offline,
+    and a QueryProfiler to profile sampled /query requests; their reports
+    are printed to the server log.
+    """
+    
+    def __init__(self, chatbot, host="127.0.0.1", port=8080, workers=8, max_pending=32,
+                 request_timeout=15.0, idle_timeout=30.0, max_body=16384, profiler=None):
+        """Configure the server; nothing listens until start()"""
+        super().__init__(host, port, idle_timeout, max_body)
+        self.chatbot = chatbot
+        self.profiler = profiler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        
+        self._slots = None
+        self._admitted = 0
+        
+        self.queries = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.errors = 0
+    
+    async def start(self):
+        """Start listening; returns the (host, port) actually bound"""
+        self._slots = asyncio.Semaphore(self.workers)
+        return await super().start()
+    
+    def stats(self):
+        """Get request counters and current load"""
+        return {
+            "uptime": round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+            "requests": self.requests,
+            "queries": self.queries,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "active": min(self._admitted, self.workers),
+            "pending": max(self._admitted - self.workers, 0),
+            "workers": self.workers,
+            "max_pending": self.max_pending
+        }
+    
+    async def _respond(self, writer, request, keep_alive):
+        """Route a request, streaming /query/stream and answering everything else in one go"""
+        method, path, params, _, body = request
+        if path == "/query/stream":
+            await self._stream(writer, method, body, keep_alive)
+        elif path == "/metrics":
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET /metrics")
+            metrics = self.chatbot.metrics
+            if params.get("format") == "jsonl":
+                await self._send_text(writer, HTTPStatus.OK, metrics.to_jsonl(), "application/x-ndjson; charset=utf-8", keep_alive)
+            else:
+                await self._send_text(writer, HTTPStatus.OK, metrics.to_prometheus(), "text/plain; version=0.0.4; charset=utf-8", keep_alive)
+        else:
+            status, payload = await self._dispatch(method, path, body)
+            await self._send(writer, status, payload, keep_alive)
+    
+    async def _dispatch(self, method, path, body):
+        """Route a request to its handler and get (status, payload)"""
+        if path == "/health":
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET /health")
+            payload = {"status": "ok", **self.chatbot.get_status(), "server": self.stats()}
+            if self.profiler:
+                payload["profiler"] = self.profiler.stats()
+            return HTTPStatus.OK, payload
+        
+        if path == "/query":
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST /query")
+            query = self._parse_query(body)
+            started = time.perf_counter()
+            response = await self._answer(query)
+            return HTTPStatus.OK, {
+                "query": query,
+                "response": response,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+        
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+    
+    def _parse_query(self, body):
+        """Get the query text out of a JSON request body"""
+        try:
+            data = json.loads(body or b"{}")
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+        
+        query = data.get("query") if isinstance(data, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Body must look like {"query": "..."}')
+        return query.strip()
+    
+    def _admit(self):
+        """Take a place among running and waiting queries, shedding load when the queue is full"""
+        if self._admitted >= self.workers + self.max_pending:
+            self.rejected += 1
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy, try again shortly", {"Retry-After": "1"})
+        self._admitted += 1
+    
+    async def _answer(self, query):
+        """Answer a query once a worker slot is free, shedding load when the queue is full"""
+        self._admit()
+        try:
+            return await asyncio.wait_for(self._run_query(query), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, f"No answer within {self.request_timeout}s")
+        except Exception as e:
+            self.errors += 1
+            raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, f"Error processing query: {e}")
+        finally:
+            self._admitted -= 1
+    
+    async def _run_query(self, query):
+        """Run the chatbot on a query inside a worker slot"""
+        async with self._slots:
+            self.queries += 1
+            if self.profiler and self.profiler.should_profile():
+                # The sync pipeline runs in one thread, so the profiler sees all of it
+                loop = asyncio.get_running_loop()
+                profile = functools.partial(self.profiler.profile, self.chatbot.process_query, query, label=query)
+                response, report = await loop.run_in_executor(None, profile)
+                if report:
+                    print(format_profile(report))
+                return response
+            return await self.chatbot.aprocess_query(query)
+    
+    async def _stream(self, writer, method, body, keep_alive):
+        """Answer POST /query/stream, sending each piece of the answer the moment it is ready
+        
+        Errors before the first byte get a normal JSON error response;
+        once streaming has started, a timeout ends the stream with an
+        {"error": ...} line instead.
+        """
+        if method != "POST":
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST /query/stream")
+        query = self._parse_query(body)
+        started = time.perf_counter()
+        
+        self._admit()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.request_timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, f"No answer within {self.request_timeout}s")
+            
+            try:
+                self.queries += 1
+                writer.write(self._head(HTTPStatus.OK, {
+                    "Content-Type": "application/x-ndjson; charset=utf-8",
+                    "Transfer-Encoding": "chunked",
+                    "Connection": "keep-alive" if keep_alive else "close"
+                }))
+                
+                chunks = self.chatbot.astream_query(query)
+                while True:
+                    remaining = started + self.request_timeout - time.perf_counter()
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                    except StopAsyncIteration:
+                        last = {"done": True, "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+                        break
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        last = {"error": f"No complete answer within {self.request_timeout}s"}
+                        break
+                    await self._send_chunk(writer, {"chunk": chunk})
+                
+                await self._send_chunk(writer, last)
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            finally:
+                self._slots.release()
+        finally:
+            self._admitted -= 1
+    
+    async def _send_chunk(self, writer, payload):
+        """Write one JSON line as an HTTP chunk and flush it"""
+        line = json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n"
+        writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+        await writer.drain()
+
+def run_server(chatbot, host="127.0.0.1", port=8080, **options):
+    """Serve the chatbot over HTTP until interrupted"""
+    server = ChatServer(chatbot, host, port, **options)
+    
+    async def serve():
+        bound_host, bound_port = await server.start()
+        print(f"{Fore.GREEN}🌐 CryptoBuddy Pro serving on http://{bound_host}:{bound_port} "
+              f"({server.workers} workers, {server.max_pending} queued, {server.request_timeout}s timeout){Style.RESET_ALL}")
+        print(f"{Fore.YELLOW}   POST /query {{\"query\": \"...\"}}  •  POST /query/stream  •  GET /health  •  GET /metrics  •  Ctrl+C to stop{Style.RESET_ALL}")
+        await server.serve_forever()
+    
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print(f"\n{Fore.CYAN}👋 Server stopped.{Style.RESET_ALL}")
@@ -0,0 +1,145 @@
+"""
+CryptoBuddy Pro - Table Utilities
+Fast rendering of the fixed-schema tables in chat responses
+"""
+
+import re
+from functools import lru_cache
+
+try:
+    import wcwidth
+except ImportError:  # tabulate measures with len() in that case too
+    wcwidth = None
+
+# CSI sequences (colour codes), which tabulate does not count towards widths
+_ANSI_CODES = re.compile(r"\x1b\[[\x30-\x3f]*[\x20-\x2f]*[\x40-\x7e]")
+
+# First characters of anything float() might accept, once whitespace is stripped
+_NUMBER_START = frozenset("0123456789+-.iInN")
+
+# Numbers with thousands separators, which tabulate also parses
+_THOUSANDS = re.compile(r"^(([+-]?[0-9]{1,3})(?:,([0-9]{3}))*)?(?(1)\.[0-9]*|\.[0-9]+)?$")
+
+def _parses_as_number(text):
+    """Whether tabulate could read a cell as a number (erring towards yes)"""
+    if not (text[0] in _NUMBER_START or text[0].isdecimal()):
+        return False
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return _THOUSANDS.match(text) is not None
+
+@lru_cache(maxsize=4096)
+def _measure(cell):
+    """Visible width of a cell without escape codes, measured the way tabulate does"""
+    if "\x1b" in cell:
+        cell = _ANSI_CODES.sub("", cell)
+    if wcwidth is None or (cell.isascii() and cell.isprintable()):
+        return len(cell)
+    return wcwidth.wcswidth(cell)
+
+def visible_width(cell):
+    """Terminal width of a cell, ignoring ANSI escape codes"""
+    if cell.isascii() and cell.isprintable():
+        # Prices, symbols and market caps never hold escapes or wide characters
+        return len(cell)
+    return _measure(cell)
+
+class GridTable:
+    """Renders rows of a fixed column schema exactly like tabulate's "grid" format
+    
+    Text columns are left-aligned and stripped, integer columns are
+    right-aligned, and widths count what the terminal shows, so colour
+    codes from format_change and emoji icons line up as tabulate would
+    align them. Header widths and cell widths of repeated values are
+    computed once. Tables tabulate would lay out differently (multi-line
+    cells, hyperlinks, or a text column that parses as numbers) are
+    handed to tabulate.
+    """
+    
+    def __init__(self, headers, int_columns=()):
+        """Describe the table by its headers and the indexes of its integer columns"""
+        self.headers = list(headers)
+        self.int_columns = frozenset(int_columns)
+        self._header_widths = [visible_width(header) for header in self.headers]
+        # tabulate leaves two spaces of room next to every header
+        self._min_widths = [width + 2 for width in self._header_widths]
+    
+    def render(self, rows):
+        """Format rows (sequences of cells in header order) as a grid table"""
+        columns = list(zip(*rows)) if rows else [()] * len(self.headers)
+        if len(columns) != len(self.headers):
+            return self._tabulate(rows)
+        
+        padded_columns = []
+        widths = []
+        for index, column in enumerate(columns):
+            right = index in self.int_columns
+            texts = self._int_texts(column) if right else self._text_texts(column)
+            if texts is None:
+                return self._tabulate(rows)
+            
+            text_widths = [visible_width(text) for text in texts]
+            width = max(self._min_widths[index], *text_widths) if text_widths else self._min_widths[index]
+            if right:
+                padded_columns.append([f" {' ' * (width - w)}{text} " for text, w in zip(texts, text_widths)])
+            else:
+                padded_columns.append([f" {text}{' ' * (width - w)} " for text, w in zip(texts, text_widths)])
+            widths.append(width)
+        
+        border = "+" + "+".join(["-" * (width + 2) for width in widths]) + "+"
+        lines = [border, self._header_row(widths, right_aligned=bool(rows)),
+                 "+" + "+".join(["=" * (width + 2) for width in widths]) + "+"]
+        for cells in zip(*padded_columns):
+            lines.append("|" + "|".join(cells) + "|")
+            lines.append(border)
+        
+        if not rows:
+            lines.append(border)
+        return "\n".join(lines)
+    
+    def _header_row(self, widths, right_aligned):
+        """The header line; integer column headers are right-aligned when there are rows"""
+        parts = []
+        for index, header in enumerate(self.headers):
+            padding = " " * (widths[index] - self._header_widths[index])
+            if right_aligned and index in self.int_columns:
+                parts.append(f" {padding}{header} ")
+            else:
+                parts.append(f" {header}{padding} ")
+        return "|" + "|".join(parts) + "|"
+    
+    def _int_texts(self, column):
+        """Cell texts for an integer column, or None if a cell is not a plain integer"""
+        texts = []
+        for value in column:
+            text = value if isinstance(value, str) else str(value) if type(value) is int else None
+            if text is None or not (text.isascii() and text.isdigit()):
+                return None
+            texts.append(text)
+        return texts
+    
+    def _text_texts(self, column):
+        """Cell texts for a text column, or None if tabulate would treat it as numbers"""
+        texts = []
+        numeric = True
+        for value in column:
+            if value is None:
+                text = ""
+            elif isinstance(value, str):
+                if "\n" in value or "\r" in value or "\x1b]" in value:
+                    return None
+                text = value.strip()
+            else:
+                return None
+            if numeric and text:
+                plain = _ANSI_CODES.sub("", text).lstrip() if "\x1b" in text else text
+                numeric = not plain or _parses_as_number(plain)
+            texts.append(text)
+        return None if numeric and texts else texts
+    
+    def _tabulate(self, rows):
+        """Render through tabulate for layouts this renderer does not model"""
+        from tabulate import tabulate
+        return tabulate(rows, headers=self.headers, tablefmt="grid")